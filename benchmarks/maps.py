@@ -0,0 +1,81 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import random
+from resources import LevelData
+
+NODE_SIZE = 100
+
+
+def generate_map(size, room=8, seed=0):
+    """ Create a size x size level map of rooms joined by doorways
+
+    Rows are strings of '#' (wall) and ' ' (floor), like the level files.
+    Every room wall gets a two tile doorway at a random (seeded) position.
+    """
+    rng = random.Random(seed)
+    grid = [[" "] * size for _ in range(size)]
+    for i in range(size):
+        grid[0][i] = grid[size - 1][i] = "#"
+        grid[i][0] = grid[i][size - 1] = "#"
+
+    # -- room walls
+    for k in range(room, size - 1, room):
+        for i in range(size):
+            grid[k][i] = "#"
+            grid[i][k] = "#"
+
+    # -- doorways through every wall segment between two rooms
+    bounds = list(range(0, size - 1, room)) + [size - 1]
+    for k in bounds[1:-1]:
+        for lo, hi in zip(bounds, bounds[1:]):
+            if hi - lo < 4:
+                continue
+            d = rng.randrange(lo + 1, hi - 2)
+            grid[k][d] = grid[k][d + 1] = " "
+            grid[d][k] = grid[d + 1][k] = " "
+    return ["".join(row) for row in grid]
+
+
+def walkable_tiles(data):
+    return [
+        (x, y) for y, row in enumerate(data) for x, d in enumerate(row) if d == " "
+    ]
+
+
+def tile_center(tile):
+    x, y = tile
+    return (x * NODE_SIZE + NODE_SIZE / 2, y * NODE_SIZE + NODE_SIZE / 2)
+
+
+def generate_level(size, enemies=0, seed=0):
+    """ Create LevelData for a generated map with enemies on random tiles """
+    rng = random.Random(seed)
+    data = generate_map(size, seed=seed)
+    tiles = walkable_tiles(data)
+
+    player = tile_center(tiles[0])
+    positions, waypoints = [], []
+    for tile in rng.sample(tiles[1:], min(enemies, len(tiles) - 1)):
+        # -- patrol between the spawn tile and a walkable neighbour
+        x, y = tile
+        near = [n for n in ((x + 1, y), (x - 1, y), (x, y + 1)) if n in tiles]
+        pos = tile_center(tile)
+        positions.append(pos)
+        waypoints.append([pos] + [tile_center(n) for n in near[:1]])
+
+    return LevelData(data, f"Generated {size}", player, [], positions, waypoints, [])
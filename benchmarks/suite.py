@@ -0,0 +1,294 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import io
+import os
+import time
+import math
+import pickle
+import random
+import tempfile
+import statistics
+import pymunk as pm
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from resources import Resources
+from resources.atlas import SpriteAtlas
+from core.math import Vec2
+from core.object import Map, Projectile
+from core.collection import Collection
+from core.object.astar import Astar, JumpPointSearch
+from core.object.hpastar import HierarchicalAstar
+from core.physics import PhysicsWorld, PhysicsBody
+from core.app import HeadlessApplication
+from simulate import Simulation
+from .maps import generate_map, generate_level, walkable_tiles, tile_center
+
+BENCHMARKS = []
+
+
+# -- reason to skip the benchmarks that need numpy, None when it is installed
+NEEDS_NUMPY = None if numpy else "numpy is not installed"
+
+
+def benchmark(name, sized=True, skip=None):
+    """ Register func(size) -> measurement under name
+
+    Benchmarks that are not sized run once, with size None. With a skip
+    reason the benchmark is reported as skipped instead of run.
+    """
+
+    def register(func):
+        BENCHMARKS.append((name, func, sized, skip))
+        return func
+
+    return register
+
+
+def measure(func, repeat=5, number=1):
+    """ Time func, returning per-call statistics over repeat runs in seconds """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def setup():
+    """ Create the headless app and resources every benchmark relies on """
+    if Resources.instance is None:
+        Resources(headless=True)
+    if HeadlessApplication.instance is None:
+        # XXX the application is a singleton, so it has to be the Simulation
+        Simulation(generate_level(8))
+
+
+def create_map(data):
+    """ Create a Map (and its wall colliders) in a fresh physics world """
+    PhysicsWorld()
+    return Map(data)
+
+
+def far_nodes(data):
+    """ Walkable tile centers in opposite corners of data """
+    tiles = walkable_tiles(data)
+    return tile_center(tiles[0]), tile_center(tiles[-1])
+
+
+def bench_path(navmap, data):
+    """ Time a corner to corner path, recording the nodes the search expanded """
+    start, goal = far_nodes(data)
+    result = measure(lambda: navmap.calculate_path(start, goal), repeat=3)
+    result["expanded"] = navmap.expanded
+    return result
+
+
+@benchmark("astar.calculate_path")
+def bench_astar_path(size):
+    data = generate_map(size)
+    return bench_path(Astar(data, Map.node_size), data)
+
+
+@benchmark("jps.calculate_path")
+def bench_jps_path(size):
+    data = generate_map(size)
+    return bench_path(JumpPointSearch(data, Map.node_size), data)
+
+
+@benchmark("hpa.calculate_path")
+def bench_hpa_path(size):
+    data = generate_map(size)
+    return bench_path(HierarchicalAstar(data, Map.node_size), data)
+
+
+@benchmark("astar.closest_node")
+def bench_astar_closest(size):
+    navmap = create_map(generate_map(size))._navmap
+    rng = random.Random(size)
+    extent = size * 100
+    points = [(rng.uniform(0, extent), rng.uniform(0, extent)) for _ in range(50)]
+
+    def closest():
+        for p in points:
+            navmap.closest_node(p)
+
+    return measure(closest)
+
+
+@benchmark("physics.on_update")
+def bench_physics(size):
+    data = generate_map(size)
+    create_map(data)
+    world = PhysicsWorld.instance
+
+    # -- a moving circle body on every other walkable tile
+    rng = random.Random(size)
+    for tile in walkable_tiles(data)[::2]:
+        body = PhysicsBody(100, pm.moment_for_circle(100, 0, 30))
+        body.position = tile_center(tile)
+        body.velocity = (rng.uniform(-5, 5), rng.uniform(-5, 5))
+        world.add(body, pm.Circle(body, 30))
+
+    return measure(lambda: world.on_update(1 / 60), repeat=5)
+
+
+@benchmark("scene.on_update")
+def bench_scene(size):
+    level = generate_level(size, enemies=size // 2, seed=size)
+    sim = Simulation(level)
+    scene = sim.scene
+
+    # -- let enemies leave their idle state before timing
+    sim.run(steps=200)
+
+    # -- projectiles in flight, fired by the player from random floor tiles
+    rng = random.Random(size)
+    player = scene.player
+    for tile in rng.sample(walkable_tiles(level.map), size * 2):
+        a = rng.uniform(0, 2 * math.pi)
+        direction = Vec2(math.cos(a), math.sin(a))
+        player.projectiles.add(tile_center(tile), direction)
+
+    return measure(lambda: scene.on_update(1 / 60), repeat=5, number=20)
+
+
+def bench_enemies(size, batched):
+    """ Time the enemy collection alone, with size * 4 enemies patrolling """
+    level = generate_level(size, enemies=size * 4, seed=size)
+    sim = Simulation(level, batched=batched)
+    sim.run(steps=200)
+    enemies = sim.scene.enemy
+    return measure(lambda: enemies.on_update(1 / 60), repeat=5, number=20)
+
+
+@benchmark("enemy.on_update")
+def bench_enemy_update(size):
+    return bench_enemies(size, batched=False)
+
+
+@benchmark("enemy_batched.on_update", skip=NEEDS_NUMPY)
+def bench_enemy_batched_update(size):
+    return bench_enemies(size, batched=True)
+
+
+def bench_projectiles(size, system):
+    """ Time size * 32 projectiles in flight, as physics bodies or in the system """
+    level = generate_level(size, seed=size)
+    scene = Simulation(level).scene
+    physics, bullets = scene.physics, scene.bullets
+    projectiles = Collection(Projectile)
+
+    rng = random.Random(size)
+    tiles = walkable_tiles(level.map)
+    for _ in range(size * 32):
+        a = rng.uniform(0, 2 * math.pi)
+        args = tile_center(rng.choice(tiles)), Vec2(math.cos(a), math.sin(a))
+        if system:
+            bullets.fire(*args)
+        else:
+            projectiles.add(*args)
+
+    def update():
+        if system:
+            bullets.on_update(1 / 60)
+        else:
+            projectiles.on_update(1 / 60)
+            physics.on_update(1 / 60)
+
+    return measure(update, repeat=5, number=20)
+
+
+@benchmark("projectile.on_update")
+def bench_projectile_update(size):
+    return bench_projectiles(size, system=False)
+
+
+@benchmark("bullets.on_update", skip=NEEDS_NUMPY)
+def bench_bullets_update(size):
+    return bench_projectiles(size, system=True)
+
+
+def sprite_paths():
+    res = Resources.instance
+    return [os.path.join(res._sprites, s) for s in os.listdir(res._sprites)]
+
+
+@benchmark("resources._load", sized=False)
+def bench_resources_load(size):
+    """ Time what a windowed load does short of making textures: read the
+    level files and the sprite atlas pages from their cache
+    """
+    res = Resources.instance
+    paths = sprite_paths()
+    with tempfile.TemporaryDirectory() as root:
+        cache = os.path.join(root, "sprites.atlas")
+        SpriteAtlas(paths).save(cache)
+
+        def load():
+            res._data.clear()
+            res._load()
+            SpriteAtlas.for_files(paths, cache)
+
+        return measure(load, repeat=5, number=10)
+
+
+@benchmark("atlas.pack", sized=False)
+def bench_atlas_pack(size):
+    """ Time decoding and packing every sprite, a load without a cached atlas """
+    paths = sprite_paths()
+    return measure(lambda: SpriteAtlas(paths), repeat=3)
+
+
+@benchmark("resources._parse_level")
+def bench_parse_level(size):
+    level = generate_level(size, enemies=size // 2, seed=size)
+    blob = pickle.dumps(level)
+    res = Resources.instance
+    return measure(lambda: res._parse_level(io.BytesIO(blob)), repeat=5, number=10)
+
+
+def run(sizes, names=None, log=print):
+    """ Run registered benchmarks (or only names) at every map size """
+    setup()
+    results = {}
+    for name, func, sized, skip in BENCHMARKS:
+        if names and name not in names:
+            continue
+        if skip:
+            log(f"{name:<32} skipped, {skip}")
+            continue
+        for size in sizes if sized else [None]:
+            key = f"{name}[{size}]" if sized else name
+            results[key] = func(size)
+            line = f"{key:<32} median {results[key]['median'] * 1000:10.3f} ms"
+            if "expanded" in results[key]:
+                line += f"  expanded {results[key]['expanded']} nodes"
+            log(line)
+    return results
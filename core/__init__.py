@@ -15,5 +15,5 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-from .app import Application
+from .app import Application, HeadlessApplication
 from .physics import PhysicsWorld
@@ -16,8 +16,13 @@
 #  MA 02110-1301, USA.
 
 import pyglet as pg
+import itertools as it
 from core.utils import profile
 
+# -- fixed simulation timestep, and the most steps a frame may run to catch up
+TIMESTEP = 1 / 60
+MAX_CATCHUP_STEPS = 5
+
 
 class Application(object):
     """ Base Application """
@@ -25,6 +30,9 @@ class Application(object):
     # -- singleton
     instance = None
 
+    # -- whether there is a window (and gl context) to draw into
+    headless = False
+
     def __new__(cls, *args, **kwargs):
         if Application.instance is None:
             Application.instance = object.__new__(cls)
@@ -54,6 +62,14 @@ class Application(object):
             **{ev: getattr(self._events, "do_" + ev[3:]) for ev in EVENTS}
         )
 
+        # XXX ONE MASTER LOOP
+        # Processed objects are stepped at a fixed TIMESTEP from a single clock
+        # callback, while drawing happens every frame. alpha is how far the
+        # frame is between the last two steps, used to interpolate when drawing.
+        self.alpha = 1.0
+        self._accumulator = 0.0
+        self._updates = []
+
     def _clear(self):
         self._window.clear()
         pg.gl.glClearColor(0.2, 0.3, 0.3, 1)
@@ -92,9 +108,30 @@ class Application(object):
         self._window.push_handlers(on_draw=self._clear)
         pg.gl.glBlendFunc(pg.gl.GL_SRC_ALPHA, pg.gl.GL_ONE_MINUS_SRC_ALPHA)
         pg.gl.glEnable(pg.gl.GL_BLEND)
+        # -- capped at the timestep, the accumulator absorbs any clock jitter
+        pg.clock.schedule_interval(self._tick, TIMESTEP)
         with profile(debug):
             pg.app.run()
 
+    def _tick(self, dt):
+        """ Run as many fixed steps as the elapsed time needs """
+        self._accumulator += dt
+        steps = 0
+        while self._accumulator >= TIMESTEP and steps < MAX_CATCHUP_STEPS:
+            self.step(TIMESTEP)
+            self._accumulator -= TIMESTEP
+            steps += 1
+
+        # -- too far behind, drop the backlog instead of spiralling
+        if self._accumulator >= TIMESTEP:
+            self._accumulator %= TIMESTEP
+        self.alpha = self._accumulator / TIMESTEP
+
+    def step(self, dt):
+        """ Advance all processed objects by dt """
+        for update in list(self._updates):
+            update(dt)
+
     @staticmethod
     def quit():
         pg.app.exit()
@@ -104,14 +141,62 @@ class Application(object):
         self = cls.instance
         self._events.push_handlers(obj)
         if hasattr(obj, "on_update"):
-            pg.clock.schedule_interval(obj.on_update, 1 / 60)
+            self._updates.append(obj.on_update)
 
     @classmethod
     def remove(cls, obj):
         self = cls.instance
         self._events.remove_handlers()
         if hasattr(obj, "on_update"):
-            pg.clock.unschedule(obj.on_update)
+            self._updates.remove(obj.on_update)
+
+
+class HeadlessApplication(Application):
+    """ Application without a window, for running scenes off-screen
+
+    Nothing is drawn, and processed objects are updated at a fixed timestep
+    as fast as the cpu allows instead of by the pyglet clock.
+    """
+
+    headless = True
+
+    def __init__(self, size, name, resizable=False):
+        # XXX Application.__init__ is skipped, it opens a window
+        self._size = size
+        self._name = name
+        self._resizable = resizable
+        self._running = False
+
+        self._window = None
+        self._events = AppEvents()
+
+        self.alpha = 1.0
+        self._accumulator = 0.0
+        self._updates = []
+
+    def _get_size(self):
+        return self._size
+
+    def _set_size(self, val):
+        self._size = val
+
+    size = property(_get_size, _set_size)
+    w = property(lambda self: self._size[0])
+    h = property(lambda self: self._size[1])
+
+    def run(self, debug=False, steps=None, dt=TIMESTEP):
+        """ Step dt at a time until quit, or until steps have been taken """
+        self._running = True
+        with profile(debug):
+            ticks = it.count() if steps is None else range(steps)
+            for _ in ticks:
+                if not self._running:
+                    break
+                self.step(dt)
+
+    @staticmethod
+    def quit():
+        HeadlessApplication.instance._running = False
 
 
 class AppEvents(pg.event.EventDispatcher):
@@ -15,7 +15,9 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-import operator as op
+import time
+from core.timing import FrameTimer
+from core.event import DispatchTable
 
 
 class Collection:
@@ -24,11 +26,15 @@ class Collection:
     def __init__(self, object_type):
         self._class = object_type
         self._items = []
+        self._dispatch = DispatchTable(
+            lambda: ((self._key(obj), obj) for obj in self._items)
+        )
 
     def add(self, *args, **kwargs):
         """ Add a single object of type self._class to the collection """
         obj = self._class(*args, **kwargs)
         self._items.append(obj)
+        self._dispatch.add(self._key(obj), obj)
 
     def add_many(self, count, *args, **kwargs):
         """ Add count objects of type self._class to the collection """
@@ -40,12 +46,34 @@ class Collection:
     def __iter__(self):
         return iter(self._items)
 
+    def _key(self, obj):
+        """ Name of obj in timings, all items of a type share it, e.g. Enemy[*]
+
+        Items die and shift while the game runs, so a per item name would
+        blend the times of different objects.
+        """
+        return f"{type(obj).__name__}[*]"
+
     def _iter_call_meth(self, method, *args, **kwargs):
         """ Call meth for all objects """
-        for obj in self:
-            if hasattr(obj, method):
-                f = op.methodcaller(method, *args, **kwargs)
-                f(obj)
+        timer = FrameTimer.instance
+        if timer and timer.enabled:
+            self._timed_call_meth(timer, method, *args, **kwargs)
+            return
+
+        for _, handler in self._dispatch.handlers(method):
+            handler(*args, **kwargs)
+
+    def _timed_call_meth(self, timer, method, *args, **kwargs):
+        """ Call meth like _iter_call_meth, recording the time per type of object
+
+        The collection itself is timed by its owner, so these records are
+        nested in that one.
+        """
+        for name, handler in self._dispatch.handlers(method):
+            start = time.perf_counter()
+            handler(*args, **kwargs)
+            timer.record(name, method, time.perf_counter() - start, nested=True)
 
     # XXX Event handlers
     def on_draw(self):
@@ -61,12 +89,10 @@ class Collection:
         self._iter_call_meth("on_update", dt)
 
         # -- remove destroyed items from the collection
-        self._items = [
-            item
-            for item in self
-            if (hasattr(item, "destroyed") and not item.destroyed)
-            or not hasattr(item, "destroyed")
-        ]
+        alive = [item for item in self if not getattr(item, "destroyed", False)]
+        if len(alive) != len(self._items):
+            self._items = alive
+            self._dispatch.invalidate()
 
     def on_resize(self, *args):
         self._iter_call_meth("on_resize", *args)
@@ -19,10 +19,18 @@ import math
 import pymunk as pm
 import itertools as it
 
+try:
+    import numpy as np
+except ImportError:
+    # -- optional, only the batched enemy system needs it
+    np = None
+
 from .entity import Entity
+from .lod import AIScheduler
 from core.math import Vec2
 from resources import Resources
-from core.physics import PhysicsWorld
+from core.physics import PhysicsWorld, COLLISION_ENEMY
+from core.proximity import Proximity
 from core.collection import Collection
 from core.object import ProjectileCollection, Map
 
@@ -36,13 +44,36 @@ def raycast(start, end):
     return world.space.segment_query_first(start, end, 1, RAYCAST_FILTER)
 
 
-def EnemyCollection(positions, waypoints):
-    col = Collection(Enemy)
+def line_of_sight(start, target):
+    """ True if target can be seen from start, None if target is gone
+
+    Only walls block the view: the map's visibility table answers most
+    checks, and a ray through the tile grid the rest.
+    """
+    if target.space is None:
+        return None
+
+    world = Map.instance
+    visible = world.line_of_sight(start, target.position)
+    if visible is None:
+        visible = world.raycast_tiles(start, target.position) is None
+    return visible
+
+
+def EnemyCollection(positions, waypoints, batched=False):
+    """ Collection of enemies, batched steers them all in one numpy pass
+
+    Only the steering is batched, the state machines still run per enemy.
+    """
+    col = EnemySystem() if batched else EnemyGroup()
     col.add_many(len(positions), position=positions, waypoints=waypoints)
     return col
 
 
 class Enemy(Entity):
+
+    COLLISION = COLLISION_ENEMY
+
     def __init__(self, **kwargs):
         super().__init__(
             image=Resources.instance.sprite("robot1_gun"),
@@ -55,12 +86,12 @@ class Enemy(Entity):
         self.body.tag = "Enemy"
         self.shape.filter = pm.ShapeFilter(categories=RAYCAST_CATEGORY)
 
-        self.trigger_area = pm.Circle(self.body, 250)
-        self.trigger_area.sensor = True
-        self.trigger_area.color = (255, 0, 0, 100)
-        PhysicsWorld.instance.add(self.trigger_area)
-        PhysicsWorld.instance.register_collision(
-            self.trigger_area.collision_type,
+        # -- the player is noticed within trigger_radius
+        self.trigger_radius = 250
+        Proximity.instance.watch(
+            self.body,
+            "Player",
+            self.trigger_radius,
             on_enter=self.on_body_entered,
             on_exit=self.on_body_exited,
         )
@@ -80,10 +111,11 @@ class Enemy(Entity):
 
         self.return_path = []
         self.return_target = None
+        self.path_request = None
 
         # XXX EnemyState_Chase
         self.chase_target = None
-        self.chase_radius = self.trigger_area.radius * 1.25
+        self.chase_radius = self.trigger_radius * 1.25
 
         # XXX EnemyState_Attack
         self.projectiles = ProjectileCollection()
@@ -95,16 +127,41 @@ class Enemy(Entity):
         self.alert = False
         self.alert_target = None
 
+        # -- set by an EnemySystem that steers this enemy
+        self.system = None
+        self.system_index = None
+
+        # -- AI level of detail, the scheduler decides when the state machine runs
+        self.lod_period = 1
+        self.thinking = True
+        self.promoted = False
+        self._frame_dt = 0
+        self._think_dt = 0
+
     def new_state(self, state):
         if self._state:
             self._state.exit(self)
         self._state = state
         self._state.enter(self)
 
+    def on_draw(self):
+        self.projectiles.on_draw()
+        super().on_draw()
+
+    def _get_engaged(self):
+        return self.alert or self._state in (EnemyState_CHASE, EnemyState_ATTACK)
+
+    engaged = property(_get_engaged)
+
     def on_update(self, dt):
         super().on_update(dt)
 
-        self._state.update(self, dt)
+        # -- states get all the time since they last ran
+        self._frame_dt = dt
+        self._think_dt += dt
+        if self.thinking:
+            self._state.update(self, self._think_dt)
+            self._think_dt = 0
         self.projectiles.on_update(dt)
 
     def on_collision_enter(self, other):
@@ -115,11 +172,10 @@ class Enemy(Entity):
             self.damage(10)
 
     def on_body_entered(self, other):
+        self.promoted = True
         if hasattr(other, "tag") and other.tag == "Player":
             # -- check that the body is in our line of sight
-            hit = raycast(self.position, other.position)
-            visible = hit.shape in other.shapes
-            if visible:
+            if line_of_sight(self.position, other):
                 self.chase_target = other
                 if self._state is not EnemyState_CHASE:
                     self.new_state(EnemyState_CHASE)
@@ -134,20 +190,54 @@ class Enemy(Entity):
             self.alert = False
             self.alert_target = None
 
+    def destroy(self):
+        Proximity.instance.unwatch(self.body)
+        self.projectiles.destroy()
+        super().destroy()
+
+    def _set_velocity(self, vel):
+        if self.system:
+            # -- overrides any steering recorded earlier this tick
+            self.system.stop(self)
+        self.body.velocity = vel
+
+    velocity = property(Entity._get_velocity, _set_velocity)
+
     def _look_at(self, target):
+        if self.system:
+            self.system.look_at(self, target)
+            return
+
         tx, ty = target
         px, py = self.position
         self.rotation = math.atan2(ty - py, tx - px)
 
-    def _move_to(self, target, dt):
+    def _move_to(self, target):
+        """ Head for target until the next think
+
+        Velocity is the step of one tick, so it uses the frame time. An enemy
+        thinking every few ticks slows down so it does not run past target.
+        """
+        step = self.speed * self._frame_dt
+        if self.system:
+            self.system.move_to(self, target, step, self.lod_period)
+            return
+
         diff = Vec2(target) - self.position
         dist = self.position.get_dist_sqrd(target)
         if dist:
+            if self.lod_period > 1:
+                step = min(step, math.sqrt(dist) / self.lod_period)
             dx, dy = diff.normalized()
-            self.velocity = (dx * self.speed * dt, dy * self.speed * dt)
+            self.velocity = (dx * step, dy * step)
         else:
             self.velocity = (0, 0)
 
+    def _dist_sqrd(self, target):
+        if self.system:
+            return self.system.dist_sqrd(self, target)
+        return self.position.get_dist_sqrd(target)
+
     def _shoot_at(self, target):
         """ Eject projectile every attack frequency"""
         self.attack_counter += 1
@@ -156,14 +246,171 @@ class Enemy(Entity):
             # -- set relative muzzle location
             muzzle_loc = Vec2(self.radius * 1.5, -self.radius * 0.4)
 
+            # -- aim at target itself, an EnemySystem only turns us after all
+            # states have run
+            tx, ty = target
+            px, py = self.position
+            aim = math.atan2(ty - py, tx - px)
+
             # -- calculate direction of (1.muzzle location), (2.enemy rotation)
-            rotation = muzzle_loc.angle + self.rotation
+            rotation = muzzle_loc.angle + aim
             d_muzzle = Vec2(math.cos(rotation), math.sin(rotation))
-            d_enemy = Vec2(math.cos(self.rotation), math.sin(self.rotation))
+            d_enemy = Vec2(math.cos(aim), math.sin(aim))
 
             # -- eject bullet
             pos = self.position + (d_muzzle * muzzle_loc.length)
-            self.projectiles.add(pos, d_enemy, self.batch, tag="EnemyBullet")
+            self.projectiles.add(pos, d_enemy, tag="EnemyBullet")
+
+
+class EnemyGroup(Collection):
+    """ Enemies that think as often as their AI scheduler lets them """
+
+    def __init__(self):
+        super(EnemyGroup, self).__init__(Enemy)
+        self.scheduler = AIScheduler()
+
+    def on_update(self, dt):
+        self.scheduler.update(self._items)
+        self._think(dt)
+
+    def _think(self, dt):
+        super(EnemyGroup, self).on_update(dt)
+
+
+class EnemySystem(EnemyGroup):
+    """ Enemies whose steering runs as one numpy pass per tick
+
+    Positions, steering targets, speeds and look targets of all enemies
+    live in arrays. States still decide where each enemy goes, but
+    _move_to and _look_at only record the target. After all states have
+    run, velocities and rotations are computed together and written back
+    to the bodies. Distances to the targets of the last tick are computed
+    the same way, before the states run. Shots are aimed at their target
+    directly, so they leave in the same direction as in an EnemyGroup.
+
+    Only steering is batched, every enemy still runs its own state machine.
+    With few enemies the array bookkeeping costs more than it saves.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("numpy is required for batched enemies")
+        super(EnemySystem, self).__init__()
+        self.capacity = 0
+        self._enemies = []
+        self._resize()
+
+    def add(self, *args, **kwargs):
+        super(EnemySystem, self).add(*args, **kwargs)
+        enemy = self._items[-1]
+        enemy.system = self
+
+        # -- rows are kept spare and doubled when full, so adding n enemies is O(n)
+        i = len(self._enemies)
+        if i == self.capacity:
+            self._resize(2 * self.capacity)
+            return
+        self._targets[i] = tuple(enemy.position)
+        enemy.system_index = i
+        self._enemies.append(enemy)
+
+    def _resize(self, capacity=0):
+        """ (Re)build the arrays for the current enemies, with rows for capacity """
+        n = len(self._items)
+        capacity = max(capacity, n)
+        old = set(self._enemies)
+        targets = np.zeros((capacity, 2))
+        for i, enemy in enumerate(self._items):
+            if enemy in old:
+                targets[i] = self._targets[enemy.system_index]
+            else:
+                targets[i] = tuple(enemy.position)
+            enemy.system_index = i
+
+        self.capacity = capacity
+        self._enemies = list(self._items)
+        self._position = np.zeros((capacity, 2))
+        self._targets = targets
+        self._looks = np.zeros((capacity, 2))
+        self._steps = np.zeros(capacity)
+        self._periods = np.ones(capacity)
+        self._moving = np.zeros(capacity, dtype=bool)
+        self._looking = np.zeros(capacity, dtype=bool)
+        self._dist = []
+        self._target_list = []
+        self._position_list = []
+
+    def move_to(self, enemy, target, step, period=1):
+        i = enemy.system_index
+        self._targets[i] = tuple(target)
+        self._steps[i] = step
+        self._periods[i] = period
+        self._moving[i] = True
+
+    def look_at(self, enemy, target):
+        i = enemy.system_index
+        self._looks[i] = tuple(target)
+        self._looking[i] = True
+
+    def stop(self, enemy):
+        self._moving[enemy.system_index] = False
+
+    def dist_sqrd(self, enemy, target):
+        """ Squared distance from enemy to target, batched for last tick's target """
+        i = enemy.system_index
+        tx, ty = target
+        sx, sy = self._target_list[i]
+        if tx == sx and ty == sy:
+            return self._dist[i]
+
+        px, py = self._position_list[i]
+        return (tx - px) ** 2 + (ty - py) ** 2
+
+    def on_update(self, dt):
+        if len(self._enemies) != len(self._items):
+            self._resize(self.capacity)
+        super(EnemySystem, self).on_update(dt)
+
+    def _think(self, dt):
+        enemies = self._enemies
+        thinking = [i for i, e in enumerate(enemies) if e.thinking]
+
+        # -- read positions of enemies about to think, then distances to targets
+        if thinking:
+            positions = [tuple(enemies[i].body.position) for i in thinking]
+            self._position[thinking] = positions
+        self._position_list = self._position.tolist()
+        diff = self._targets - self._position
+        dist = np.einsum("ij,ij->i", diff, diff)
+        self._dist = dist.tolist()
+        self._target_list = self._targets.tolist()
+
+        self._moving[:] = False
+        self._looking[:] = False
+        super(EnemySystem, self)._think(dt)
+        if not thinking:
+            return
+
+        # -- steer everything at once, then write back the enemies that asked
+        diff = self._targets - self._position
+        length = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        steps = np.where(
+            self._periods > 1,
+            np.minimum(self._steps, length / self._periods),
+            self._steps,
+        )
+        scale = np.divide(steps, length, out=np.zeros_like(length), where=length > 0)
+        velocity = (diff * scale[:, None]).tolist()
+
+        look = self._looks - self._position
+        angle = np.arctan2(look[:, 1], look[:, 0]).tolist()
+
+        moving, looking = self._moving.tolist(), self._looking.tolist()
+        for i in thinking:
+            if moving[i]:
+                enemies[i].body.velocity = velocity[i]
+            if looking[i]:
+                enemies[i].body.angle = angle[i]
 
 
 class EnemyState:
@@ -207,28 +454,36 @@ class EnemyState_IDLE(EnemyState):
 class EnemyState_PATROL(EnemyState):
     """
     Move enemy through navigation path
-        - If player comes within trigger_area, Transition to CHASE
+        - If player comes within trigger_radius, Transition to CHASE
     """
 
     @staticmethod
     def enter(enemy):
         # Calculate return path to waypoints if we cannot see patrol_target
-        hit = raycast(enemy.position, enemy.patrol_target)
+        hit = Map.instance.raycast_tiles(enemy.position, enemy.patrol_target)
         if hit:
             # patrol target is not visible, calculate path to it
             start = Map.instance.find_closest_node(enemy.position)
             end = Map.instance.find_closest_node(enemy.patrol_target)
 
-            enemy.return_path = iter(Map.instance.find_path(start, end))
-            enemy.return_target = next(enemy.return_path)
+            # -- keep heading for patrol_target until the path is found
+            if enemy.path_request:
+                enemy.path_request.cancel()
+            enemy.path_request = Map.instance.request_path(start, end)
 
     @staticmethod
     def update(enemy, dt):
         target = None
 
+        request = enemy.path_request
+        if request and request.ready:
+            enemy.path_request = None
+            enemy.return_path = iter(request.path)
+            enemy.return_target = next(enemy.return_path, None)
+
         if enemy.return_target:
             # -- return to waypoints
-            dist = enemy.position.get_dist_sqrd(enemy.return_target)
+            dist = enemy._dist_sqrd(enemy.return_target)
             if dist < enemy.patrol_epsilon:
                 try:
                     enemy.return_target = next(enemy.return_path)
@@ -240,29 +495,29 @@ class EnemyState_PATROL(EnemyState):
             target = enemy.return_target or enemy.patrol_target
         else:
             # -- navigate waypoints
-            dist = enemy.position.get_dist_sqrd(enemy.patrol_target)
+            dist = enemy._dist_sqrd(enemy.patrol_target)
             if dist < enemy.patrol_epsilon:
                 enemy.patrol_target = next(enemy.waypoints)
             target = enemy.patrol_target
 
         enemy._look_at(target)
-        enemy._move_to(target, dt)
+        enemy._move_to(target)
 
         # XXX EDGE CASE
-        # Player is in trigger area but is not visible
+        # Player is in trigger radius but is not visible
         # Escaped during CHASE or ATTACK
         if enemy.alert:
             # Cast ray to see if player has become visible
             target = enemy.alert_target
-            hit = raycast(enemy.position, target.position)
-            visible = hit.shape in target.shapes
-            if visible:
+            if line_of_sight(enemy.position, target):
                 enemy.chase_target = target
                 enemy.new_state(EnemyState_CHASE)
 
     @staticmethod
     def exit(enemy):
-        pass
+        if enemy.path_request:
+            enemy.path_request.cancel()
+            enemy.path_request = None
 
 
 class EnemyState_CHASE(EnemyState):
@@ -281,21 +536,27 @@ class EnemyState_CHASE(EnemyState):
         target = enemy.chase_target
 
         # XXX Check if target went out of sight
-        hit = raycast(enemy.position, target.position)
+        visible = line_of_sight(enemy.position, target)
         # -- Possible target died
-        if not hit:
+        if visible is None:
             enemy.new_state(EnemyState_PATROL)
             return
 
-        visible = hit.shape in target.shapes
         # -- still in our line of sight
         if visible:
-            # Chase
+            # Chase, every chaser of target shares its flow field. Head
+            # straight for target while the field is built, and once it is
+            # only a node away.
+            goal = target.position
+            field = Map.instance.flow_field(goal)
+            if field and field.distance(enemy.position) > 1:
+                goal = field.next_node(enemy.position) or goal
+
             enemy._look_at(target.position)
-            enemy._move_to(target.position, dt)
+            enemy._move_to(goal)
 
             # Attack if we are really close
-            dist = enemy.position.get_dist_sqrd(target.position)
+            dist = enemy._dist_sqrd(target.position)
             if dist < (enemy.chase_radius ** 2) / 2:
                 enemy.attack_target = target
                 enemy.new_state(EnemyState_ATTACK)
@@ -327,20 +588,19 @@ class EnemyState_ATTACK(EnemyState):
         target = enemy.attack_target
 
         # XXX Check if target went out of sight
-        hit = raycast(enemy.position, target.position)
+        visible = line_of_sight(enemy.position, target)
         # -- Possible target died
-        if not hit:
+        if visible is None:
             enemy.new_state(EnemyState_PATROL)
             return
 
-        visible = hit.shape in target.shapes
         # -- still in our line of sight
         if visible:
             enemy._look_at(target.position)
             enemy._shoot_at(target.position)
 
             # -- Target moved away, Chase
-            dist = enemy.position.get_dist_sqrd(target.position)
+            dist = enemy._dist_sqrd(target.position)
             if dist > (enemy.chase_radius ** 2) / 2:
                 enemy.chase_target = target
                 enemy.new_state(EnemyState_CHASE)
@@ -19,18 +19,24 @@ import math
 import pyglet as pg
 import pymunk as pm
 
-from core.object import Map
+from core.object import Map, BulletSystem
 from core.app import Application
+from core.math import lerp, lerp_angle
+from core.proximity import Proximity
+from core.render import RenderWorld
 from core.physics import PhysicsWorld, PhysicsBody
 from core.utils import reset_matrix, image_set_size, image_set_anchor_center
 
 
 class Entity(object):
+
+    # -- collision category of the entity shape, set by subclasses
+    COLLISION = None
+
     def __init__(self, **kwargs):
         self.speed = 0.0
         self.radius = 30.0
         self.image = None
-        self.batch = pg.graphics.Batch()
 
         # -- health
         self.health = 100
@@ -44,31 +50,49 @@ class Entity(object):
         self.shape = pm.Circle(self.body, self.radius)
 
         # -- LOAD PROPERTIES
+        self.sprite = None
+        self.minimap_sprite = None
+        self._show_minimap = False
+        self._headless = Application.instance.headless
         self._window_size = Application.instance.size
         if "image" in kwargs:
             self.image = kwargs.pop("image")
-            image_set_size(self.image, self.radius * 2, self.radius * 2)
-            image_set_anchor_center(self.image)
-
-            self.sprite = pg.sprite.Sprite(self.image, *self.position, batch=self.batch)
+            if not self._headless:
+                image_set_size(self.image, self.radius * 2, self.radius * 2)
+                image_set_anchor_center(self.image)
+
+                world = RenderWorld.instance
+                self.sprite = pg.sprite.Sprite(
+                    self.image,
+                    *self.position,
+                    batch=world.batch,
+                    group=world.group("entities"),
+                )
 
         if "minimap_image" in kwargs:
-            self._show_minimap = False
             self.minimap_image = kwargs.pop("minimap_image")
-            image_set_size(self.minimap_image, 25, 25)
-            image_set_anchor_center(self.minimap_image)
-            self.minimap_sprite = pg.sprite.Sprite(self.minimap_image)
+            if not self._headless:
+                image_set_size(self.minimap_image, 25, 25)
+                image_set_anchor_center(self.minimap_image)
+                self.minimap_sprite = pg.sprite.Sprite(self.minimap_image)
 
         for k, v in kwargs.items():
             if hasattr(self, k):
                 setattr(self, k, v)
 
+        # -- (position, rotation) of the last two steps, drawing interpolates them
+        self._transform = (self.position, self.rotation)
+        self._last_transform = self._transform
+
         # setup physics
         physics = PhysicsWorld.instance
         physics.add(self.body, self.shape)
         physics.register_collision(
-            self.shape.collision_type, self.on_collision_enter, self.on_collision_exit
+            self.shape, self.COLLISION, self.on_collision_enter, self.on_collision_exit
         )
+        Proximity.instance.track(self.body, self.radius)
+        if BulletSystem.instance:
+            BulletSystem.instance.track(self.body, self.radius, self.on_collision_enter)
 
     def _get_position(self):
         return self.body.position
@@ -105,7 +129,18 @@ class Entity(object):
         pass
 
     def on_draw(self):
-        self.batch.draw()
+        """ Place the sprite between the last two steps, the world draws it """
+        if self.sprite and self.sprite.image:
+            alpha = Application.instance.alpha
+            (lx, ly), lrot = self._last_transform
+            (x, y), rot = self._transform
+
+            # pyglet rotates clockwise (pymunk anti-clockwise)
+            self.sprite.update(
+                lerp(lx, x, alpha),
+                lerp(ly, y, alpha),
+                -math.degrees(lerp_angle(lrot, rot, alpha)),
+            )
 
     def on_draw_last(self):
         if self._show_minimap:
@@ -116,11 +151,10 @@ class Entity(object):
         self._window_size = (w, h)
 
     def on_update(self, dt):
-        if self.sprite.image:
-            # pyglet rotates clockwise (pymunk anti-clockwise)
-            self.sprite.update(*self.position, -math.degrees(self.rotation))
+        self._last_transform = self._transform
+        self._transform = (self.position, self.rotation)
 
-        if self.minimap_sprite.image:
+        if self.minimap_sprite and self.minimap_sprite.image:
             mmap = Map.instance._minimap
             w, h = mmap.width, mmap.height
             offx, offy = mmap.x - w, mmap.y
@@ -145,7 +179,12 @@ class Entity(object):
             self.destroy()
 
     def destroy(self):
-        PhysicsWorld.remove(self.body, self.shape)
-        self.sprite.delete()
-        self.minimap_sprite.delete()
+        PhysicsWorld.instance.remove(self.body, self.shape)
+        Proximity.instance.untrack(self.body)
+        if BulletSystem.instance:
+            BulletSystem.instance.untrack(self.body)
+        if self.sprite:
+            self.sprite.delete()
+        if self.minimap_sprite:
+            self.minimap_sprite.delete()
         self.destroyed = True
@@ -0,0 +1,76 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+# -- ticks between two thinks of an enemy, per level of detail
+LOD_PERIODS = (1, 4, 16)
+
+
+class AIScheduler:
+    """ Pick how often each enemy thinks (AI level of detail)
+
+    Enemies that are engaged, near the player or on camera think every tick.
+    The others think every 4th or 16th tick by distance, staggered so they do
+    not all think on the same tick. An enemy whose trigger area fires is
+    promoted to think right away.
+    """
+
+    def __init__(self, near=800, far=2000):
+        self.near = near
+        self.far = far
+        self.player = None
+        self.camera = None
+
+        self.tick = 0
+        # -- enemies per level of detail, on the last tick and in total
+        self.counts = [0] * len(LOD_PERIODS)
+        self.totals = [0] * len(LOD_PERIODS)
+
+    def track(self, player, camera=None):
+        """ Measure distances to player, and keep whatever camera shows detailed """
+        self.player = player
+        self.camera = camera
+
+    def update(self, enemies):
+        """ Set lod_period and thinking of every enemy for this tick """
+        self.tick += 1
+        counts = [0] * len(LOD_PERIODS)
+        view = self.camera.view() if self.camera else None
+        focus = self.player.position if self.player else None
+
+        for i, enemy in enumerate(enemies):
+            tier = self._tier(enemy, focus, view)
+            period = LOD_PERIODS[tier]
+            counts[tier] += 1
+
+            enemy.lod_period = period
+            enemy.thinking = enemy.promoted or (self.tick + i) % period == 0
+            enemy.promoted = False
+
+        self.counts = counts
+        self.totals = [t + c for t, c in zip(self.totals, counts)]
+
+    def _tier(self, enemy, focus, view):
+        if focus is None or enemy.engaged:
+            return 0
+
+        x, y = enemy.position
+        dist = (x - focus[0]) ** 2 + (y - focus[1]) ** 2
+        if dist < self.near ** 2:
+            return 0
+        if view and view.left <= x <= view.right and view.bottom <= y <= view.top:
+            return 0
+        return 1 if dist < self.far ** 2 else 2
@@ -17,15 +17,18 @@
 
 import math
 import pyglet as pg
-import pymunk as pm
 from .entity import Entity
 from resources import Resources
 from core.math import Vec2
+from core.physics import COLLISION_PLAYER
 from core.object import ProjectileCollection
 from core.utils import reset_matrix, image_set_size, global_position
 
 
 class Player(Entity):
+
+    COLLISION = COLLISION_PLAYER
+
     def __init__(self, **kwargs):
         super().__init__(
             image=Resources.instance.sprite("hitman1_gun"),
@@ -40,6 +43,12 @@ class Player(Entity):
         self.running = False
         self.run_speed = self.speed * 1.5
 
+        self.ammo = 350
+        self.ammo_h = 30
+        if not self._headless:
+            self._create_hud()
+
+    def _create_hud(self):
         # XXX HUD Elements
         self.hud_batch = pg.graphics.Batch()
 
@@ -54,8 +63,6 @@ class Player(Entity):
         self._update_healthbar_indicator()
 
         # Ammo Indicator
-        self.ammo = 350
-        self.ammo_h = 30
         self.ammo_im = Resources.instance.sprite("ammo_bullet")
         image_set_size(self.ammo_im, self.ammo_h // 3, self.ammo_h)
         self.ammo_im.anchor_y = self.ammo_im.height
@@ -96,6 +103,9 @@ class Player(Entity):
         self.ammo_text.y = py
 
     def on_damage(self, health_percent):
+        if self._headless:
+            return
+
         region = self.bar_im.get_region(
             0, 0, int(self.bar_im.width * health_percent), self.bar_im.height
         )
@@ -104,11 +114,19 @@ class Player(Entity):
 
     def on_resize(self, w, h):
         super().on_resize(w, h)
+        if self._headless:
+            return
+
         self._update_ammo_indicator()
         self._update_healthbar_indicator()
 
     def on_draw(self):
+        self.projectiles.on_draw()
         super().on_draw()
+
+    def on_draw_last(self):
+        """ Draw the HUD over the world, which draws after the player """
+        super().on_draw_last()
         with reset_matrix(*self._window_size):
             self.hud_batch.draw()
 
@@ -162,11 +180,12 @@ class Player(Entity):
             self.ammo -= 1
 
             # -- update ammo indicator
-            num_bul = self.ammo // 100
-            if len(self.ammo_sprites) > num_bul:
-                self.ammo_sprites.pop()
-            self.ammo_text.text = f" X {self.ammo}"
-            self._update_ammo_indicator()
+            if not self._headless:
+                num_bul = self.ammo // 100
+                if len(self.ammo_sprites) > num_bul:
+                    self.ammo_sprites.pop()
+                self.ammo_text.text = f" X {self.ammo}"
+                self._update_ammo_indicator()
 
             self.shoot()
 
@@ -196,10 +215,14 @@ class Player(Entity):
 
         # -- eject bullet
         pos = self.position + (d_muzzle * muzzle_loc.length)
-        self.projectiles.add(pos, d_player, self.batch, tag="PlayerBullet")
+        self.projectiles.add(pos, d_player, tag="PlayerBullet")
 
     def destroy(self):
+        self.projectiles.destroy()
         super().destroy()
+        if self._headless:
+            return
+
         self.border.delete()
         self.bar.delete()
         self.ammo_text.delete()
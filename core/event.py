@@ -20,3 +20,36 @@ def _pass_func(self, *args):
 
 methods = {meth_name : _pass_func for meth_name in EVENT_METHS}
 EventHandler = type("EventHandler", (object,), methods)
+
+
+class DispatchTable:
+    """ Per-event lists of (key, bound handler) for a group of objects
+
+    source() yields the (key, object) pairs being dispatched to. A list is
+    built the first time its event is dispatched and then reused, so handler
+    lookups only happen again after objects are added or removed.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._tables = dict()
+
+    def handlers(self, method):
+        table = self._tables.get(method)
+        if table is None:
+            table = self._tables[method] = [
+                (key, getattr(obj, method))
+                for key, obj in self._source()
+                if hasattr(obj, method)
+            ]
+        return table
+
+    def add(self, key, obj):
+        """ Subscribe a newly added object to the events already built """
+        for method, table in self._tables.items():
+            if hasattr(obj, method):
+                table.append((key, getattr(obj, method)))
+
+    def invalidate(self):
+        """ Drop all tables, they are rebuilt on the next dispatch """
+        self._tables.clear()
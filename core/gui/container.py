@@ -1,6 +1,5 @@
-import operator
-
 from core.gui.widget import Widget
+from core.event import DispatchTable
 
 
 class Container(Widget):
@@ -9,11 +8,13 @@ class Container(Widget):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.children = []
+        self._dispatch = DispatchTable(lambda: ((c, c) for c in self.children))
 
     def _add(self, item):
         self.children.append(item)
         item.parent = self
         item._dirty = True
+        self._dispatch.add(item, item)
 
     def __iadd__(self, item):
         if isinstance(item, (list, tuple)):
@@ -27,6 +28,7 @@ class Container(Widget):
         self.children.remove(item)
         item.parent = None
         self._dirty = True
+        self._dispatch.invalidate()
 
     def __isub__(self, item):
         if isinstance(item, (list, tuple)):
@@ -41,10 +43,8 @@ class Container(Widget):
 
     def _iter_call_meth(self, method, *args, **kwargs):
         """ Call meth on this object's __iter__ """
-        for obj in self:
-            if hasattr(obj, method):
-                f = operator.methodcaller(method, *args, **kwargs)
-                f(obj)
+        for _, handler in self._dispatch.handlers(method):
+            handler(*args, **kwargs)
 
     def determine_size(self):
         if self.parent:  # Ensures that we don't do this for Frames
@@ -187,3 +187,64 @@ def tmul(x, y):
 
 def tdiv(x, y):
     return tuple(map(operator.truediv, x, y))
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+
+def lerp_angle(a, b, t):
+    """ Interpolate radians a to b along the shortest arc """
+    diff = (b - a + math.pi) % (2 * math.pi) - math.pi
+    return a + diff * t
+
+
+def grid_ray(x0, y0, x1, y1):
+    """ Grid cells under a ray from x0, y0 to x1, y1 in cell units, in order
+
+    Amanatides-Woo traversal. Where the ray passes exactly through a cell
+    corner, both side cells are yielded before the diagonal one, as if the
+    ray had some thickness. A ray that ends exactly on a cell border ends in
+    the cell past it, whichever way it moves.
+    """
+    x, y = int(math.floor(x0)), int(math.floor(y0))
+    dx, dy = abs(x1 - x0), abs(y1 - y0)
+    sx, sy = (1 if x1 > x0 else -1), (1 if y1 > y0 else -1)
+    ex, ey = _ray_end(x1, x1 - x0), _ray_end(y1, y1 - y0)
+
+    # -- distance to the next border on each axis. The ray reaches the x
+    # border first when nx / dx < ny / dy, compared as nx * dy < ny * dx so
+    # that corners on half cells stay exact ties.
+    nx = (x + 1 - x0) if sx > 0 else (x0 - x)
+    ny = (y + 1 - y0) if sy > 0 else (y0 - y)
+
+    yield x, y
+    for _ in range(abs(ex - x) + abs(ey - y)):
+        if x == ex:
+            cx, cy = 1, 0
+        elif y == ey:
+            cx, cy = 0, 1
+        else:
+            cx, cy = nx * dy, ny * dx
+
+        if cx < cy:
+            x, nx = x + sx, nx + 1
+        elif cy < cx:
+            y, ny = y + sy, ny + 1
+        else:
+            yield x + sx, y
+            yield x, y + sy
+            x, nx = x + sx, nx + 1
+            y, ny = y + sy, ny + 1
+        yield x, y
+        if (x, y) == (ex, ey):
+            break
+
+
+def _ray_end(v1, d):
+    """ Cell of the ray end v1 on one axis, moving d along it """
+    cell = int(math.floor(v1))
+    if d < 0 and v1 == cell:
+        # -- on the border, stepping puts the end in the cell below it
+        cell -= 1
+    return cell
@@ -17,4 +17,8 @@
 
 from .map import Map
 from .camera import Camera
+from .flowfield import FlowField
+from .visibility import VisibilityTable
+from .pathqueue import PathQueue, PathRequest, FieldRequest
+from .bullets import BulletSystem, BulletHit
 from .projectile import Projectile, ProjectileCollection
@@ -0,0 +1,355 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import math
+import heapq
+from core.math import dist_sqr, clamp
+
+
+class PriorityQueue:
+    def __init__(self):
+        self.elements = []
+
+    def empty(self):
+        return len(self.elements) == 0
+
+    def put(self, item, priority):
+        heapq.heappush(self.elements, (priority, item))
+
+    def get(self):
+        return heapq.heappop(self.elements)[1]
+
+
+class Astar:
+    """ A* search over a dense occupancy grid of the level data
+
+    Nodes are integer ids (y * width + x) into a bytearray of walkable flags,
+    so neighbour and closest node lookups never scan the node list. Positions
+    in and out are world positions of node centers, as before.
+    """
+
+    DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+    def __init__(self, data, node_size):
+        self.data = data
+        self.node_size = node_size
+
+        self.width = len(data[0])
+        self.height = len(data)
+        self._grid = self._get_walkable_grid()
+
+        # -- nodes taken off the frontier by the last search
+        self.expanded = 0
+
+    def calculate_path(self, p1, p2):
+        """ Calculate path of walkable nodes from p1 to p2 """
+        return self._astar_search(self.node_id(p1), self.node_id(p2))
+
+    def closest_node(self, p):
+        """ Center of the walkable node nearest to p """
+        tx, ty = self.tile(p)
+        tx = clamp(tx, 0, self.width - 1)
+        ty = clamp(ty, 0, self.height - 1)
+        if self._grid[ty * self.width + tx]:
+            return self.center(tx, ty)
+
+        # -- search rings of nodes around p, until no closer node can exist
+        best, best_dist = None, None
+        step = min(self.node_size)
+        for r in range(1, max(self.width, self.height)):
+            if best and best_dist <= ((r - 0.5) * step) ** 2:
+                break
+            for x, y in self._ring(tx, ty, r):
+                if self._grid[y * self.width + x]:
+                    d = dist_sqr(p, self.center(x, y))
+                    if best is None or d < best_dist:
+                        best, best_dist = (x, y), d
+        return self.center(*best) if best else None
+
+    def line_clear(self, p1, p2, radius=0.0):
+        """ True if a circle of radius can move from p1 to p2 without touching a wall
+
+        Conservative, the circle is tested as a square at steps along the line.
+        """
+        (x1, y1), (x2, y2) = p1, p2
+        nx, ny = self.node_size
+        w, h, grid = self.width, self.height, self._grid
+        step = min(radius or nx, nx / 4, ny / 4)
+        steps = int(math.hypot(x2 - x1, y2 - y1) / step) + 1
+        for i in range(steps + 1):
+            t = i / steps
+            px, py = x1 + (x2 - x1) * t, y1 + (y2 - y1) * t
+            left, right = int((px - radius) // nx), int((px + radius) // nx)
+            bottom, top = int((py - radius) // ny), int((py + radius) // ny)
+            if left < 0 or bottom < 0 or right >= w or top >= h:
+                return False
+            for y in range(bottom, top + 1):
+                for x in range(left, right + 1):
+                    if not grid[y * w + x]:
+                        return False
+        return True
+
+    def smooth_path(self, path, radius=0.0):
+        """ Drop every waypoint that can be skipped on a straight, clear line """
+        return self._run(self._smooth(path, radius))
+
+    def tile(self, p):
+        """ Grid coordinates of world position p """
+        nx, ny = self.node_size
+        return int(p[0] // nx), int(p[1] // ny)
+
+    def center(self, x, y):
+        """ World position of the center of grid node x, y """
+        nx, ny = self.node_size
+        return (x * nx + nx / 2, y * ny + ny / 2)
+
+    def node_id(self, p):
+        x, y = self.tile(p)
+        return y * self.width + x
+
+    def set_walkable(self, x, y, walkable):
+        self._grid[y * self.width + x] = 1 if walkable else 0
+
+    def walkable(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return bool(self._grid[y * self.width + x])
+        return False
+
+    def _ring(self, cx, cy, r):
+        """ Grid nodes at chebyshev distance r from cx, cy """
+        for x in range(cx - r, cx + r + 1):
+            for y in (cy - r, cy + r):
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    yield x, y
+        for y in range(cy - r + 1, cy + r):
+            for x in (cx - r, cx + r):
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    yield x, y
+
+    def _get_walkable_grid(self):
+        """ Flag every node without a wall """
+        grid = bytearray(self.width * self.height)
+        for y, data in enumerate(self.data):
+            for x, d in enumerate(data):
+                if d == " ":
+                    grid[y * self.width + x] = 1
+        return grid
+
+    def _get_neighbours(self, node):
+        """ Find all neightbours of node that are walkable"""
+        w, grid = self.width, self._grid
+        x, y = node % w, node // w
+        return [
+            (y + dy) * w + (x + dx)
+            for dx, dy in self.DIRECTIONS
+            if 0 <= x + dx < w and 0 <= y + dy < self.height
+            and grid[(y + dy) * w + (x + dx)]
+        ]
+
+    def _get_cost(self, *ignored):
+        return 1
+
+    def _heuristic(self, a, b):
+        """ Manhattan distance between nodes a and b, in nodes """
+        w = self.width
+        return abs(a % w - b % w) + abs(a // w - b // w)
+
+    def search(self, p1, p2, radius=None):
+        """ Resumable search from p1 to p2
+
+        A generator that yields after every expanded node and returns the
+        path, so a search can be spread over several frames. With a radius
+        the path is also smoothed for an agent of that size.
+        """
+        path = yield from self._search(self.node_id(p1), self.node_id(p2))
+        if radius is not None:
+            path = yield from self._smooth(path, radius)
+        return path
+
+    def _astar_search(self, start, goal):
+        """ Run a search from start to goal to completion """
+        return self._run(self._search(start, goal))
+
+    def _run(self, search):
+        while True:
+            try:
+                next(search)
+            except StopIteration as done:
+                return done.value
+
+    def _smooth(self, path, radius):
+        """ String pull path, yielding after every line test """
+        if len(path) < 3:
+            return list(path)
+
+        # -- waypoints in the middle of straight runs never need a line test
+        corners = [path[0]]
+        for a, b, c in zip(path, path[1:], path[2:]):
+            if (b[0] - a[0], b[1] - a[1]) != (c[0] - b[0], c[1] - b[1]):
+                corners.append(b)
+        corners.append(path[-1])
+
+        smoothed = [corners[0]]
+        for i in range(1, len(corners) - 1):
+            if not self.line_clear(smoothed[-1], corners[i + 1], radius):
+                smoothed.append(corners[i])
+            yield i
+        smoothed.append(corners[-1])
+        return smoothed
+
+    def _search(self, start, goal):
+        """ Use astar algorithm to calculate path from start to goal """
+        frontier = PriorityQueue()
+        frontier.put(start, (0, 0))
+        came_from = {}
+        cost_so_far = {}
+        came_from[start] = None
+        cost_so_far[start] = 0
+        self.expanded = 0
+
+        while not frontier.empty():
+            current = frontier.get()
+            self.expanded += 1
+
+            if current == goal:
+                break
+            yield current
+
+            for _next in self._get_neighbours(current):
+                new_cost = cost_so_far[current] + self._get_cost(current, _next)
+                if _next not in cost_so_far or new_cost < cost_so_far[_next]:
+                    cost_so_far[_next] = new_cost
+                    h = self._heuristic(goal, _next)
+                    # -- on equal cost prefer nodes closer to the goal
+                    frontier.put(_next, (new_cost + h, h))
+                    came_from[_next] = current
+
+        if goal not in came_from:
+            return []
+        return self._reconstruct_path(came_from, start, goal)
+
+    def _reconstruct_path(self, came_from, start, goal):
+        w = self.width
+        current = goal
+        path = [current]
+        while current != start:
+            current = came_from[current]
+            path.append(current)
+        path.reverse()
+        return [self.center(node % w, node // w) for node in path]
+
+
+class JumpPointSearch(Astar):
+    """ Jump point search over the same grid as Astar
+
+    All moves cost the same, so runs of nodes in a straight line are skipped
+    until a node where the path may have to turn (a jump point). Only jump
+    points go on the frontier, the returned path still has every node.
+    """
+
+    def _jump(self, x, y, dx, dy, goal):
+        """ Walk from x, y in direction dx, dy and return the next jump point """
+        w, walkable = self.width, self.walkable
+        while True:
+            x, y = x + dx, y + dy
+            if not walkable(x, y):
+                return None
+
+            node = y * w + x
+            if node == goal:
+                return node
+
+            if dx:
+                # -- a side opened up that the previous node could not reach
+                if (walkable(x, y - 1) and not walkable(x - dx, y - 1)) or (
+                    walkable(x, y + 1) and not walkable(x - dx, y + 1)
+                ):
+                    return node
+            else:
+                if (walkable(x - 1, y) and not walkable(x - 1, y - dy)) or (
+                    walkable(x + 1, y) and not walkable(x + 1, y - dy)
+                ):
+                    return node
+                # -- stop where a horizontal run leads to a jump point
+                if self._jump(x, y, 1, 0, goal) is not None:
+                    return node
+                if self._jump(x, y, -1, 0, goal) is not None:
+                    return node
+
+    def _get_directions(self, node, parent):
+        """ Directions worth searching from node, when reached from parent """
+        if parent is None:
+            return self.DIRECTIONS
+
+        w = self.width
+        dx = (node % w > parent % w) - (node % w < parent % w)
+        dy = (node // w > parent // w) - (node // w < parent // w)
+        if dx:
+            return [(dx, 0), (0, 1), (0, -1)]
+        return [(0, dy), (1, 0), (-1, 0)]
+
+    def _search(self, start, goal):
+        """ Astar over jump points from start to goal """
+        w = self.width
+        frontier = PriorityQueue()
+        frontier.put(start, (0, 0))
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        self.expanded = 0
+
+        while not frontier.empty():
+            current = frontier.get()
+            self.expanded += 1
+
+            if current == goal:
+                break
+            yield current
+
+            x, y = current % w, current // w
+            for dx, dy in self._get_directions(current, came_from[current]):
+                _next = self._jump(x, y, dx, dy, goal)
+                if _next is None:
+                    continue
+
+                new_cost = cost_so_far[current] + self._heuristic(current, _next)
+                if _next not in cost_so_far or new_cost < cost_so_far[_next]:
+                    cost_so_far[_next] = new_cost
+                    h = self._heuristic(goal, _next)
+                    frontier.put(_next, (new_cost + h, h))
+                    came_from[_next] = current
+
+        if goal not in came_from:
+            return []
+        return self._reconstruct_path(came_from, start, goal)
+
+    def _reconstruct_path(self, came_from, start, goal):
+        """ Fill in the straight runs between jump points """
+        w = self.width
+        path = []
+        current = goal
+        while current != start:
+            parent = came_from[current]
+            x, y = current % w, current // w
+            px, py = parent % w, parent // w
+            dx, dy = (px > x) - (px < x), (py > y) - (py < y)
+            while (x, y) != (px, py):
+                path.append(self.center(x, y))
+                x, y = x + dx, y + dy
+            current = parent
+        path.append(self.center(start % w, start // w))
+        path.reverse()
+        return path
@@ -0,0 +1,246 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import collections
+import pyglet as pg
+
+try:
+    import numpy as np
+except ImportError:
+    # -- optional, without it every projectile is its own physics body
+    np = None
+
+from resources import Resources
+from core.app import Application
+from core.render import RenderWorld
+
+# -- what a bullet hands to the on_hit of the target it touched
+BulletHit = collections.namedtuple("BulletHit", "tag position")
+
+
+class BulletSystem:
+    """ All live bullets in numpy arrays, moved and tested in one pass a tick
+
+    Bullets are points with a radius. They die on the first wall tile
+    their leading edge enters, or on the first tracked target circle they
+    touch, whose on_hit gets a BulletHit with the bullet tag. Only bullets
+    in or next to a tile holding a target are tested against targets.
+    Each bullet owns a slot of four vertices in one vertex list of the
+    world batch, dead slots are collapsed to a point.
+    """
+
+    # -- singleton
+    instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if np is None:
+            raise ImportError("numpy is required for the bullet system")
+        if BulletSystem.instance is None:
+            BulletSystem.instance = object.__new__(cls)
+        return BulletSystem.instance
+
+    SIZE = (15, 15)
+    SPEED = 400
+
+    def __init__(self, navmap, capacity=256):
+        self.node_size = navmap.node_size
+        self.radius = min(self.SIZE) / 2
+        self._walls = np.array(
+            [[d == "#" for d in row] for row in navmap.data], dtype=bool
+        )
+
+        # -- body -> (radius, on_hit) of everything bullets can hit
+        self._targets = dict()
+
+        self.capacity = 0
+        self._position = np.zeros((0, 2))
+        self._last_position = np.zeros((0, 2))
+        self._direction = np.zeros((0, 2))
+        self._alive = np.zeros(0, dtype=bool)
+        self._tags = []
+        self._free = []
+
+        # -- live bullets at most, since creation
+        self.high_water = 0
+
+        self._vertex_list = None
+        self._grow(capacity)
+
+        self._headless = Application.instance.headless
+        if not self._headless:
+            self._image = Resources.instance.sprite("bullet")
+            world = RenderWorld.instance
+            group = pg.sprite.SpriteGroup(
+                self._image.get_texture(),
+                pg.gl.GL_SRC_ALPHA,
+                pg.gl.GL_ONE_MINUS_SRC_ALPHA,
+                parent=world.group("bullets"),
+            )
+            self._vertex_list = world.batch.add(
+                capacity * 4,
+                pg.gl.GL_QUADS,
+                group,
+                "v2f/stream",
+                ("t3f/static", self._image.tex_coords * capacity),
+            )
+
+    def _get_live(self):
+        return self.capacity - len(self._free)
+
+    live = property(_get_live)
+
+    def track(self, body, radius, on_hit):
+        """ Let bullets hit the circle of radius around body """
+        self._targets[body] = (radius, on_hit)
+
+    def untrack(self, body):
+        self._targets.pop(body, None)
+
+    def set_wall(self, x, y, wall):
+        self._walls[y, x] = wall
+
+    def fire(self, position, direction, tag=""):
+        """ Add a bullet at position, moving along (unit) direction """
+        if not self._free:
+            self._grow(self.capacity * 2)
+        i = self._free.pop()
+        self._position[i] = self._last_position[i] = tuple(position)
+        self._direction[i] = tuple(direction)
+        self._alive[i] = True
+        self._tags[i] = tag
+        self.high_water = max(self.high_water, self.live)
+
+    def clear(self):
+        self._alive[:] = False
+        self._free = list(range(self.capacity - 1, -1, -1))
+
+    def on_update(self, dt):
+        live = np.flatnonzero(self._alive)
+        if not len(live):
+            return
+
+        direction = self._direction[live]
+        position = self._position[live] + direction * (self.SPEED * dt)
+        self._last_position[live] = self._position[live]
+        self._position[live] = position
+
+        dead = self._hit_walls(position + direction * self.radius)
+        for i, body in self._hit_targets(position, ~dead):
+            # -- an earlier hit this tick may have destroyed the target
+            target = self._targets.get(body)
+            if target is None or body.space is None:
+                continue
+            target[1](BulletHit(self._tags[live[i]], tuple(position[i])))
+            dead[i] = True
+
+        dead = live[dead]
+        self._alive[dead] = False
+        self._free.extend(dead.tolist())
+
+    def on_draw(self):
+        """ Write the quads of live bullets between their last two steps """
+        if self._headless:
+            return
+
+        alpha = Application.instance.alpha
+        last, position = self._last_position, self._position
+        center = last + (position - last) * alpha
+
+        # -- corners of the quad, rotated to the direction (and nil when dead)
+        (dx, dy), alive = self._direction.T, self._alive
+        w, h = self.SIZE[0] / 2, self.SIZE[1] / 2
+        quads = np.zeros((self.capacity, 4, 2))
+        for c, (ox, oy) in enumerate(((-w, -h), (w, -h), (w, h), (-w, h))):
+            quads[:, c, 0] = center[:, 0] + ox * dx - oy * dy
+            quads[:, c, 1] = center[:, 1] + ox * dy + oy * dx
+        quads[~alive] = 0
+
+        vertices = np.frombuffer(self._vertex_list.vertices, dtype=np.float32)
+        vertices[:] = quads.ravel()
+
+    def _hit_walls(self, points):
+        """ Mask of points in a wall tile or off the map """
+        nx, ny = self.node_size
+        rows, cols = self._walls.shape
+        tx = np.floor(points[:, 0] / nx).astype(int)
+        ty = np.floor(points[:, 1] / ny).astype(int)
+        inside = (tx >= 0) & (tx < cols) & (ty >= 0) & (ty < rows)
+
+        hit = ~inside
+        hit[inside] = self._walls[ty[inside], tx[inside]]
+        return hit
+
+    def _hit_targets(self, position, candidates):
+        """ (bullet index, body) of the first target each candidate touches """
+        if not self._targets:
+            return []
+
+        bodies = [b for b in self._targets if b.space is not None]
+        if not bodies:
+            return []
+        centers = np.array([tuple(b.position) for b in bodies])
+        reach = np.array([self._targets[b][0] for b in bodies]) + self.radius
+
+        # -- broad phase, only bullets in or next to a tile with a target
+        # -- (tiles off the map are clamped to a ring around it)
+        rows, cols = self._walls.shape
+        near = np.zeros((rows + 4, cols + 4), dtype=bool)
+        tx, ty = self._ring_tiles(centers)
+        for ox in (-1, 0, 1):
+            for oy in (-1, 0, 1):
+                near[ty + oy, tx + ox] = True
+
+        bx, by = self._ring_tiles(position)
+        candidates = np.flatnonzero(candidates & near[by, bx])
+        if not len(candidates):
+            return []
+
+        offset = position[candidates, None, :] - centers[None, :, :]
+        touching = (offset ** 2).sum(axis=2) < reach ** 2
+        hits = touching.any(axis=1)
+        first = touching.argmax(axis=1)
+        return [(candidates[i], bodies[first[i]]) for i in np.flatnonzero(hits)]
+
+    def _ring_tiles(self, points):
+        """ Tile columns and rows of points, shifted by two and clamped to the
+        ring of tiles around the map
+        """
+        (nx, ny), (rows, cols) = self.node_size, self._walls.shape
+        tx = np.clip(np.floor(points[:, 0] / nx).astype(int), -1, cols) + 2
+        ty = np.clip(np.floor(points[:, 1] / ny).astype(int), -1, rows) + 2
+        return tx, ty
+
+    def _grow(self, capacity):
+        """ Make room for capacity bullets, keeping the live ones """
+        old = self.capacity
+        extra = capacity - old
+
+        def pad(array, fill=0):
+            shape = (extra,) + array.shape[1:]
+            return np.concatenate([array, np.full(shape, fill, dtype=array.dtype)])
+
+        self._position = pad(self._position)
+        self._last_position = pad(self._last_position)
+        self._direction = pad(self._direction)
+        self._alive = pad(self._alive, False)
+        self._tags.extend([""] * extra)
+        self._free = list(range(capacity - 1, old - 1, -1)) + self._free
+        self.capacity = capacity
+
+        if self._vertex_list:
+            self._vertex_list.resize(capacity * 4)
+            self._vertex_list.tex_coords[old * 12 :] = self._image.tex_coords * extra
@@ -18,7 +18,7 @@
 import pyglet as pg
 import operator as op
 from core.app import Application
-from core.math import Vec2, Bounds, clamp
+from core.math import Vec2, Bounds, clamp, lerp
 
 
 class Camera:
@@ -37,6 +37,7 @@ class Camera:
         )
         self._bounds = Bounds(*kwargs.get("bounds", (-10000, -10000, 10000, 10000)))
         self._track_target = None
+        self._last_position = Vec2(self._position)
 
     def _get_speed(self):
         return self._speed
@@ -78,11 +79,21 @@ class Camera:
 
     bounds = property(_get_bounds, _set_bounds)
 
+    def view(self):
+        """ Bounds of the world area the camera shows """
+        (px, py), (sx, sy), (w, h) = self._position, self._scale, self._size
+        return Bounds(-px / sx, -py / sy, (w - px) / sx, (h - py) / sy)
+
     def track(self, obj):
         self._track_target = obj
 
+    def on_resize(self, w, h):
+        """ Follow the window size, view() and whatever culls with it use it """
+        self.size = (w, h)
+
     def on_update(self, dt):
         """ Center the camera on target  """
+        self._last_position = Vec2(self._position)
         if not self._track_target:
             return
 
@@ -105,7 +116,14 @@ class Camera:
             # XXX NOTE: dist is added to speed to prevent camera from lagging behind
             self._position += norm * dt * (self.speed + dist)
 
+    def on_draw_first(self):
+        """ Apply the camera transform, interpolated between the last two steps """
+        if not self._track_target:
+            return
+
+        alpha = Application.instance.alpha
+        (lx, ly), (x, y) = self._last_position, self._position
         pg.gl.glMatrixMode(pg.gl.GL_MODELVIEW)
         pg.gl.glLoadIdentity()
-        pg.gl.glTranslatef(*self._position, 0)
+        pg.gl.glTranslatef(lerp(lx, x, alpha), lerp(ly, y, alpha), 0)
         pg.gl.glScalef(*self._scale, 1)
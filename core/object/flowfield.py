@@ -0,0 +1,96 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from array import array
+from collections import deque
+
+
+class FlowField:
+    """ Next node towards a goal, for every node of an Astar grid
+
+    Built with one breadth first search out from the goal, so any number of
+    agents heading for the same goal share a single search. Without build
+    the field is empty until build() has run, see Map.flow_field.
+    """
+
+    def __init__(self, navmap, goal, build=True):
+        self.navmap = navmap
+        self.goal = goal
+
+        size = navmap.width * navmap.height
+        self._next = array("i", [-1]) * size
+        self._distance = array("i", [-1]) * size
+        if build:
+            for _ in self.build():
+                pass
+
+    def build(self):
+        """ Resumable search, yields after every expanded node and returns the field """
+        nxt, distance = self._next, self._distance
+        nxt[self.goal] = self.goal
+        distance[self.goal] = 0
+
+        frontier = deque([self.goal])
+        while frontier:
+            node = frontier.popleft()
+            for n in self.navmap._get_neighbours(node):
+                if distance[n] < 0:
+                    distance[n] = distance[node] + 1
+                    nxt[n] = node
+                    frontier.append(n)
+            yield node
+        return self
+
+    def _node(self, p):
+        x, y = self.navmap.tile(p)
+        if not self.navmap.walkable(x, y):
+            return None
+        return y * self.navmap.width + x
+
+    def distance(self, p):
+        """ Nodes from p to the goal, -1 if the goal cannot be reached """
+        node = self._node(p)
+        return -1 if node is None else self._distance[node]
+
+    def next_node(self, p):
+        """ Center of the node to head for from p, None if the goal is unreachable """
+        node = self._node(p)
+        if node is None or self._next[node] < 0:
+            return None
+        nxt, w = self._next[node], self.navmap.width
+        return self.navmap.center(nxt % w, nxt // w)
+
+    def direction(self, p):
+        """ Grid direction (dx, dy) to move in from p, (0, 0) at or without a goal """
+        node = self._node(p)
+        if node is None or self._next[node] < 0:
+            return (0, 0)
+        nxt, w = self._next[node], self.navmap.width
+        return (nxt % w - node % w, nxt // w - node // w)
+
+    def path(self, p):
+        """ Node centers from p to the goal, in the same format as Astar paths """
+        node = self._node(p)
+        if node is None or self._next[node] < 0:
+            return []
+
+        w = self.navmap.width
+        path = [self.navmap.center(node % w, node // w)]
+        while node != self.goal:
+            node = self._next[node]
+            path.append(self.navmap.center(node % w, node // w))
+        return path
@@ -0,0 +1,255 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from collections import deque, defaultdict
+from .astar import Astar, PriorityQueue
+
+
+class HierarchicalAstar(Astar):
+    """ Near optimal A* over clusters of the grid (HPA*)
+
+    The grid is cut into square clusters. Where two clusters share walkable
+    border tiles, entrance nodes are placed on both sides, and the distances
+    between the entrances of each cluster are precomputed. A query searches
+    only this graph of entrances, so long paths cost about the same on any
+    map size. Each step of the result is refined into grid nodes the first
+    time a path uses it.
+
+    Changing a tile rebuilds only its cluster and the clusters next to it.
+    """
+
+    CLUSTER_SIZE = 10
+
+    # -- border openings at least this wide get an entrance at both ends
+    WIDE_ENTRANCE = 6
+
+    def __init__(self, data, node_size):
+        super(HierarchicalAstar, self).__init__(data, node_size)
+        c = self.CLUSTER_SIZE
+        self.columns = -(-self.width // c)
+        self.rows = -(-self.height // c)
+
+        # -- (cluster, higher cluster) -> [(node, node across the border)]
+        self._borders = {}
+        # -- entrance node -> entrance nodes across a border
+        self._links = defaultdict(set)
+        # -- cluster -> {entrance: {entrance: distance inside the cluster}}
+        self._intra = {}
+        # -- cluster -> {(a, b): grid nodes from entrance a to b}
+        self._segments = {}
+
+        clusters = range(self.columns * self.rows)
+        for cluster in clusters:
+            for other in self._cluster_neighbours(cluster):
+                if other > cluster:
+                    self._build_border(cluster, other)
+        for cluster in clusters:
+            self._build_cluster(cluster)
+
+    def cluster_of(self, node):
+        c = self.CLUSTER_SIZE
+        x, y = node % self.width, node // self.width
+        return (y // c) * self.columns + x // c
+
+    def set_walkable(self, x, y, walkable):
+        super(HierarchicalAstar, self).set_walkable(x, y, walkable)
+
+        cluster = self.cluster_of(y * self.width + x)
+        neighbours = self._cluster_neighbours(cluster)
+        for other in neighbours:
+            self._build_border(cluster, other)
+        for c in [cluster] + neighbours:
+            self._build_cluster(c)
+
+    def _bounds(self, cluster):
+        """ Grid rect x0, y0, x1, y1 (exclusive) covered by cluster """
+        c = self.CLUSTER_SIZE
+        x0, y0 = (cluster % self.columns) * c, (cluster // self.columns) * c
+        return x0, y0, min(x0 + c, self.width), min(y0 + c, self.height)
+
+    def _cluster_neighbours(self, cluster):
+        cx, cy = cluster % self.columns, cluster // self.columns
+        return [
+            (cy + dy) * self.columns + (cx + dx)
+            for dx, dy in self.DIRECTIONS
+            if 0 <= cx + dx < self.columns and 0 <= cy + dy < self.rows
+        ]
+
+    def _build_border(self, a, b):
+        """ Place the entrances between neighbouring clusters a and b """
+        a, b = min(a, b), max(a, b)
+        links = self._links
+        for n, m in self._borders.get((a, b), []):
+            links[n].discard(m)
+            links[m].discard(n)
+
+        # -- b is either right of a or above it
+        w, grid = self.width, self._grid
+        ax0, ay0, ax1, ay1 = self._bounds(a)
+        if b == a + 1 and b // self.columns == a // self.columns:
+            pairs = [(y * w + ax1 - 1, y * w + ax1) for y in range(ay0, ay1)]
+        else:
+            pairs = [(ay1 - 1) * w + x for x in range(ax0, ax1)]
+            pairs = [(n, n + w) for n in pairs]
+
+        entrances = []
+        run = []
+        for n, m in pairs + [(None, None)]:
+            if n is not None and grid[n] and grid[m]:
+                run.append((n, m))
+                continue
+            if len(run) >= self.WIDE_ENTRANCE:
+                entrances.extend([run[0], run[-1]])
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+
+        self._borders[(a, b)] = entrances
+        for n, m in entrances:
+            links[n].add(m)
+            links[m].add(n)
+
+    def _entrances(self, cluster):
+        entrances = set()
+        for other in self._cluster_neighbours(cluster):
+            side = 0 if cluster < other else 1
+            key = (min(cluster, other), max(cluster, other))
+            entrances.update(pair[side] for pair in self._borders.get(key, []))
+        return entrances
+
+    def _build_cluster(self, cluster):
+        """ Distances between every pair of entrances of cluster """
+        entrances = self._entrances(cluster)
+        intra = {}
+        for e in entrances:
+            distance, _ = self._search_cluster(e, cluster)
+            intra[e] = {o: distance[o] for o in entrances if o != e and o in distance}
+        self._intra[cluster] = intra
+        self._segments[cluster] = {}
+
+    def _search_cluster(self, source, cluster):
+        """ Breadth first search from source that stays inside cluster """
+        x0, y0, x1, y1 = self._bounds(cluster)
+        w = self.width
+        distance = {source: 0}
+        came_from = {source: None}
+        frontier = deque([source])
+        while frontier:
+            node = frontier.popleft()
+            for n in self._get_neighbours(node):
+                if n not in distance and x0 <= n % w < x1 and y0 <= n // w < y1:
+                    distance[n] = distance[node] + 1
+                    came_from[n] = node
+                    frontier.append(n)
+        return distance, came_from
+
+    def _segment(self, cluster, a, b):
+        """ Grid nodes from entrance a to entrance b, refined once and kept """
+        segments = self._segments[cluster]
+        if (a, b) not in segments:
+            _, came_from = self._search_cluster(a, cluster)
+            nodes = self._walk(came_from, b)
+            nodes.reverse()
+            segments[(a, b)] = nodes
+            segments[(b, a)] = nodes[::-1]
+        return segments[(a, b)]
+
+    def _walk(self, came_from, node):
+        """ Nodes from node back to the source of a search """
+        nodes = []
+        while node is not None:
+            nodes.append(node)
+            node = came_from[node]
+        return nodes
+
+    def _search(self, start, goal):
+        """ Search the entrance graph from start to goal, then refine it """
+        self.expanded = 0
+        if not self._grid[goal]:
+            return []
+
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        start_distance, start_from = self._search_cluster(start, start_cluster)
+        if start_cluster == goal_cluster and goal in start_distance:
+            nodes = self._walk(start_from, goal)
+            nodes.reverse()
+            return self._to_centers(nodes)
+
+        # -- start and goal join the graph through the entrances they can reach
+        goal_distance, goal_from = self._search_cluster(goal, goal_cluster)
+        entries = {
+            e: start_distance[e]
+            for e in self._entrances(start_cluster)
+            if e in start_distance
+        }
+        exits = {
+            e: goal_distance[e]
+            for e in self._entrances(goal_cluster)
+            if e in goal_distance
+        }
+
+        frontier = PriorityQueue()
+        frontier.put(start, (0, 0))
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+
+        while not frontier.empty():
+            current = frontier.get()
+            self.expanded += 1
+
+            if current == goal:
+                break
+            yield current
+
+            if current == start:
+                edges = list(entries.items())
+            else:
+                intra = self._intra[self.cluster_of(current)].get(current, {})
+                edges = list(intra.items())
+                if current in exits:
+                    edges.append((goal, exits[current]))
+            edges.extend((n, 1) for n in self._links[current])
+
+            for _next, cost in edges:
+                new_cost = cost_so_far[current] + cost
+                if _next not in cost_so_far or new_cost < cost_so_far[_next]:
+                    cost_so_far[_next] = new_cost
+                    h = self._heuristic(goal, _next)
+                    frontier.put(_next, (new_cost + h, h))
+                    came_from[_next] = current
+
+        if goal not in came_from:
+            return []
+
+        abstract = self._walk(came_from, goal)
+        abstract.reverse()
+        nodes = [start]
+        for a, b in zip(abstract, abstract[1:]):
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):
+                nodes.append(b)
+            elif a == start:
+                nodes.extend(reversed(self._walk(start_from, b)[:-1]))
+            elif b == goal:
+                nodes.extend(self._walk(goal_from, a)[1:])
+            else:
+                nodes.extend(self._segment(cluster, a, b)[1:])
+        return self._to_centers(nodes)
+
+    def _to_centers(self, nodes):
+        w = self.width
+        return [self.center(node % w, node // w) for node in nodes]
@@ -15,16 +15,26 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-import heapq
+import math
 import operator
 import pyglet as pg
 import pymunk as pm
 import itertools as it
+from collections import OrderedDict
 from resources import Resources
 from core.app import Application
-from core.physics import PhysicsWorld
-from core.utils import reset_matrix, image_set_size
-from core.math import tadd, tmul, dist_sqr, heuristic
+from core.render import RenderWorld
+from core.physics import PhysicsWorld, COLLISION_WALL
+from core.utils import reset_matrix
+from core.math import tmul, grid_ray
+from .astar import Astar, JumpPointSearch
+from .hpastar import HierarchicalAstar
+from .flowfield import FlowField
+from .visibility import VisibilityTable
+from .pathqueue import PathQueue, PathRequest, FieldRequest
+from .bullets import BulletSystem
+
+PATH_ENGINES = {"astar": Astar, "jps": JumpPointSearch, "hpa": HierarchicalAstar}
 
 
 class Map(object):
@@ -33,25 +43,60 @@ class Map(object):
     # -- singleton
     instance = None
 
-    def __new__(cls, *args):
+    def __new__(cls, *args, **kwargs):
         if Map.instance is None:
             Map.instance = object.__new__(cls)
         return Map.instance
 
-    sprites = []
     node_size = (100, 100)
 
-    def __init__(self, data):
+    # -- tiles per side of a render chunk, only chunks the camera sees are drawn
+    chunk_size = 8
+
+    # -- most flow fields and paths kept, least recently used are dropped first
+    flow_field_cache = 16
+    path_cache_size = 256
+
+    # -- drop waypoints an agent of this radius can skip on a straight line
+    smooth_paths = True
+    agent_radius = 30
+
+    # -- microseconds of path searching per frame, or search on a worker thread
+    path_budget = 1000
+    threaded_paths = False
+
+    def __init__(self, data, pathing="astar", visibility=None):
         super(Map, self).__init__()
         self.data = [r for r in data if "#" in r]
-        self.batch = pg.graphics.Batch()
 
+        # -- (cx, cy) -> (groups, vertex lists) of a chunk, hidden unless shown
+        self.camera = None
+        self._chunks = dict()
+        self._shown = set()
         self._minimap = None
         self._minimap_drop = None
         self._show_minimap = False
-        self._navmap = Astar(self.data, self.node_size)
+        self._navmap = PATH_ENGINES[pathing](self.data, self.node_size)
+        self._flow_fields = OrderedDict()
+        self._field_requests = dict()
+        self._path_cache = PathCache(self.path_cache_size)
+        if getattr(self, "_path_queue", None):
+            # -- the singleton is reused for the next level, stop the old worker
+            self._path_queue.close()
+        self._path_queue = PathQueue(
+            self._navmap, self.path_budget, threaded=self.threaded_paths
+        )
+        self._walls = []
+        self._visibility = None
+        if visibility:
+            # -- baked once and kept at the visibility path, next to the level
+            self._visibility = VisibilityTable.for_level(
+                self.data, self.node_size, visibility
+            )
         self._generate()
-        self._generate_minimap()
+        if not Application.instance.headless:
+            self._generate_chunks()
+            self._generate_minimap()
 
     def _get_size(self):
         nx, ny = self.node_size
@@ -60,31 +105,107 @@ class Map(object):
     size = property(_get_size)
 
     def _generate(self):
+        """ Add wall colliders, adjacent wall tiles are merged into large boxes """
+        nx, ny = self.node_size
+        world = PhysicsWorld.instance
+        if self._walls:
+            world.remove(self._walls)
+
+        rects = merge_tiles(self.data, "#")
+        self._walls = []
+        for (ix, iy, w, h) in rects:
+            bb = pm.BB(ix * nx, iy * ny, (ix + w) * nx, (iy + h) * ny)
+            wall = pm.Poly.create_box_bb(world.space.static_body, bb)
+            wall.collision_type = COLLISION_WALL
+            world.add(wall)
+            self._walls.append(wall)
+
+        # -- wall tiles vs the colliders created for them
+        self.wall_tiles = sum(row.count("#") for row in self.data)
+        self.wall_shapes = len(rects)
+
+    def _generate_chunks(self, tiles=None):
+        """ Bake the tiles into chunks of static quads in the world batch, or
+        only the chunks holding tiles [(x, y), ...]
+        """
+        size = self.chunk_size
+        if tiles is None:
+            for key in list(self._chunks):
+                self._delete_chunk(key)
+            nx = math.ceil(len(self.data[0]) / size)
+            ny = math.ceil(len(self.data) / size)
+            keys = it.product(range(nx), range(ny))
+        else:
+            keys = {(x // size, y // size) for x, y in tiles}
+
         wall_img = Resources.instance.sprite("wall")
-        image_set_size(wall_img, *self.node_size)
         floor_img = Resources.instance.sprite("floor")
-        image_set_size(floor_img, *self.node_size)
-
-        self.sprites.clear()
+        for key in keys:
+            self._delete_chunk(key)
+            self._chunks[key] = self._bake_chunk(key, wall_img, floor_img)
+
+    def _bake_chunk(self, key, wall_img, floor_img):
+        """ Vertex lists of the floor and wall quads in chunk key, each under a
+        chunk group of its world layer so the chunk can be hidden
+        """
+        (cx, cy), size = key, self.chunk_size
         nx, ny = self.node_size
-        sx, sy = len(self.data[0]), len(self.data)
-        for (ix, iy) in it.product(range(sx), range(sy)):
-            data = self.data[iy][ix]
-            px, py = tmul((ix, iy), self.node_size)
-            if data:
-                sp = pg.sprite.Sprite(
-                    wall_img if data == "#" else floor_img, x=px, y=py, batch=self.batch
-                )
-                self.sprites.append(sp)
-
-                if data == "#":
-                    # -- add collision box
-                    world = PhysicsWorld.instance
-                    wall = pm.Poly.create_box(
-                        world.space.static_body, size=self.node_size
-                    )
-                    wall.body.position = (px + nx / 2, py + ny / 2)
-                    world.add(wall)
+        world = RenderWorld.instance
+
+        # -- image -> (vertices, tex_coords) of its tiles
+        quads = dict()
+        for iy in range(cy * size, min((cy + 1) * size, len(self.data))):
+            row = self.data[iy]
+            for ix in range(cx * size, min((cx + 1) * size, len(row))):
+                data = row[ix]
+                if not data:
+                    continue
+
+                img = wall_img if data == "#" else floor_img
+                verts, coords = quads.setdefault(img, ([], []))
+                px, py = tmul((ix, iy), self.node_size)
+                verts.extend((px, py, px + nx, py, px + nx, py + ny, px, py + ny))
+                coords.extend(img.tex_coords)
+
+        groups, vertex_lists = [], []
+        for img, (verts, coords) in quads.items():
+            layer = world.group("walls" if img is wall_img else "floor")
+            chunk = pg.graphics.Group(parent=layer)
+            chunk.visible = key in self._shown
+            group = pg.sprite.SpriteGroup(
+                img.get_texture(),
+                pg.gl.GL_SRC_ALPHA,
+                pg.gl.GL_ONE_MINUS_SRC_ALPHA,
+                parent=chunk,
+            )
+            vertex_list = world.batch.add(
+                len(verts) // 2,
+                pg.gl.GL_QUADS,
+                group,
+                ("v2f/static", verts),
+                ("t3f/static", coords),
+            )
+            groups.append(chunk)
+            vertex_lists.append(vertex_list)
+        return groups, vertex_lists
+
+    def _delete_chunk(self, key):
+        groups, vertex_lists = self._chunks.pop(key, ((), ()))
+        for vertex_list in vertex_lists:
+            vertex_list.delete()
+
+    def visible_chunks(self):
+        """ Keys of the chunks the camera shows, all of them without a camera """
+        if not self.camera:
+            return set(self._chunks)
+
+        # -- a tile of margin, drawing interpolates the camera behind its position
+        (mx, my), size = self.node_size, self.chunk_size
+        cw, ch = mx * size, my * size
+        left, bottom, right, top = self.camera.view()
+        cols = range(math.floor((left - mx) / cw), math.ceil((right + mx) / cw))
+        rows = range(math.floor((bottom - my) / ch), math.ceil((top + my) / ch))
+        return {key for key in it.product(cols, rows) if key in self._chunks}
 
     def _generate_minimap(self):
         wall_color = (50, 50, 50, 255)
@@ -134,7 +255,12 @@ class Map(object):
         self._minimap_drop = drop.create_image(w, h)
 
     def on_draw(self):
-        self.batch.draw()
+        """ Show only the chunks the camera sees, the world batch draws them """
+        shown = self.visible_chunks()
+        for key in shown ^ self._shown:
+            for group in self._chunks[key][0]:
+                group.visible = key in shown
+        self._shown = shown
 
     def on_draw_last(self):
         if self._show_minimap:
@@ -142,8 +268,16 @@ class Map(object):
                 self._minimap_drop.blit(0, 0)
                 self._minimap.draw()
 
+    def on_update(self, dt):
+        for request in self._path_queue.process():
+            if isinstance(request, FieldRequest):
+                self._cache_field(request)
+            else:
+                self._cache_path(request.key, request.path)
+
     def on_resize(self, w, h):
-        self._generate_minimap()
+        if not Application.instance.headless:
+            self._generate_minimap()
 
     def on_key_press(self, symbol, mod):
         if symbol == pg.window.key.TAB:
@@ -153,92 +287,208 @@ class Map(object):
         if symbol == pg.window.key.TAB:
             self._show_minimap = False
 
+    @property
+    def path_cache(self):
+        return self._path_cache
+
+    def set_tile(self, x, y, tile):
+        """ Change the tile at x, y ('#' wall, ' ' floor) and rebuild what uses it """
+        row = self.data[y]
+        if isinstance(row, str):
+            self.data[y] = row[:x] + tile + row[x + 1 :]
+        else:
+            row[x] = tile
+
+        # -- a threaded path search may be walking the grid right now
+        with self._path_queue.lock:
+            self._navmap.set_walkable(x, y, tile == " ")
+            self._path_queue.restart()
+        if self._visibility:
+            self._visibility.update(x, y, tile == " ")
+        if BulletSystem.instance:
+            BulletSystem.instance.set_wall(x, y, tile == "#")
+        self._generate()
+        if not Application.instance.headless:
+            self._generate_chunks([(x, y)])
+            self._generate_minimap()
+
+        # -- a new wall breaks the paths through it, new floor may shorten any path
+        self._flow_fields.clear()
+        if tile == "#":
+            self._path_cache.invalidate((x, y, x, y))
+        else:
+            self._path_cache.invalidate()
+
     def find_path(self, p1, p2):
-        return self._navmap.calculate_path(p1, p2)
+        """ Waypoints from p1 to p2 (node centers), cached per (start, goal) node """
+        navmap = self._navmap
+        key = (navmap.node_id(p1), navmap.node_id(p2))
+        path = self._path_cache.get(key)
+        if path is None:
+            path = self._smooth(navmap.calculate_path(p1, p2))
+            self._cache_path(key, path)
+        return list(path)
+
+    def request_path(self, p1, p2):
+        """ Like find_path, but searched over the next frames
+
+        Returns a PathRequest, its path is set once the search is done.
+        Cached paths are ready right away.
+        """
+        navmap = self._navmap
+        radius = self.agent_radius if self.smooth_paths else None
+        key = (navmap.node_id(p1), navmap.node_id(p2))
+        request = PathRequest(p1, p2, key, radius)
+        path = self._path_cache.get(request.key)
+        if path is not None:
+            request._finish(list(path))
+            return request
+        return self._path_queue.submit(request)
+
+    def _smooth(self, path):
+        if not self.smooth_paths:
+            return path
+        return self._navmap.smooth_path(path, self.agent_radius)
+
+    def _cache_path(self, key, path):
+        self._path_cache.put(key, path, [self._navmap.tile(p) for p in path])
+
+    def raycast_tiles(self, start, end):
+        """ Grid coordinates of the first wall tile between start and end, or None
+
+        Walks only the tiles under the line, cells outside the map count as walls.
+        """
+        nx, ny = self.node_size
+        walkable = self._navmap.walkable
+        ray = grid_ray(start[0] / nx, start[1] / ny, end[0] / nx, end[1] / ny)
+        for x, y in ray:
+            if not walkable(x, y):
+                return x, y
+        return None
+
+    def line_of_sight(self, p1, p2):
+        """ True if no wall is between p1 and p2, as proven by the visibility table
+
+        None if the table cannot prove it (or there is none), the caller has
+        to cast a ray.
+        """
+        if self._visibility is None:
+            return None
+        return self._visibility.lookup(p1, p2)
 
     def find_closest_node(self, p):
         return self._navmap.closest_node(p)
 
-
-class PriorityQueue:
-    def __init__(self):
-        self.elements = []
-
-    def empty(self):
-        return len(self.elements) == 0
-
-    def put(self, item, priority):
-        heapq.heappush(self.elements, (priority, item))
-
-    def get(self):
-        return heapq.heappop(self.elements)[1]
-
-
-class Astar:
-    def __init__(self, data, node_size):
-        self.data = data
-        self.node_size = node_size
-
-        self._walkable = self._get_walkable_nodes()
-
-    def calculate_path(self, p1, p2):
-        """ Calculate path of walkable nodes from p1 to p2 """
-        return self._astar_search(p1, p2)
-
-    def closest_node(self, p):
-        data = [(dist_sqr(p, point), point) for point in self._walkable]
-        return min(data, key=lambda d: d[0])[1]
-
-    def _get_walkable_nodes(self):
-        """ Find all node positions without a wall """
-        hns = (self.node_size[0] / 2, self.node_size[1] / 2)
-        walkable = [
-            tadd(hns, tmul((x, y), self.node_size))
-            for y, data in enumerate(self.data)
-            for x, d in enumerate(data)
-            if d == " "
-        ]
-        return walkable
-
-    def _get_neighbours(self, p):
-        """ Find all neightbours of p that are walkable"""
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        neigh_positions = [tadd(p, tmul(d, self.node_size)) for d in directions]
-        return [n for n in neigh_positions if n in self._walkable]
-
-    def _get_cost(self, *ignored):
-        return 1
-
-    def _astar_search(self, start, goal):
-        """ Use astar algorithm to calculate path from start to goal """
-        frontier = PriorityQueue()
-        frontier.put(start, 0)
-        came_from = {}
-        cost_so_far = {}
-        came_from[start] = None
-        cost_so_far[start] = 0
-
-        while not frontier.empty():
-            current = frontier.get()
-
-            if current == goal:
-                break
-
-            for _next in self._get_neighbours(current):
-                new_cost = cost_so_far[current] + self._get_cost(current, _next)
-                if _next not in cost_so_far or new_cost < cost_so_far[_next]:
-                    cost_so_far[_next] = new_cost
-                    priority = new_cost + heuristic(goal, _next)
-                    frontier.put(_next, priority)
-                    came_from[_next] = current
-
-        return self._reconstruct_path(came_from, start, goal)
-
-    def _reconstruct_path(self, came_from, start, goal):
-        current = goal
-        path = [current]
-        while current != start:
-            current = came_from[current]
-            path.append(current)
-        path.reverse()
-        return path
+    def flow_field(self, goal):
+        """ Flow field towards the node closest to goal, None while it is built
+
+        Fields are built by the path queue over the next frames and cached
+        per goal node, so agents following a moving goal only wait for a
+        field when it enters a new node.
+        """
+        node = self._navmap.node_id(self.find_closest_node(goal))
+        field = self._flow_fields.get(node)
+        if field:
+            self._flow_fields.move_to_end(node)
+            return field
+
+        if node not in self._field_requests:
+            request = self._path_queue.submit(FieldRequest(node))
+            self._field_requests[node] = request
+        return None
+
+    def _cache_field(self, request):
+        del self._field_requests[request.key]
+        if not isinstance(request.field, FlowField):
+            # -- the build failed, the next call asks again
+            return
+
+        self._flow_fields[request.key] = request.field
+        if len(self._flow_fields) > self.flow_field_cache:
+            self._flow_fields.popitem(last=False)
+
+
+def merge_tiles(data, tile):
+    """ Greedily cover every `tile` cell in data with maximal rectangles
+
+    Each uncovered cell grows right as far as it can, then up for as long as
+    the whole row span matches. Returns (x, y, w, h) in tile coordinates.
+    """
+    rows, cols = len(data), len(data[0])
+    covered = [[False] * cols for _ in range(rows)]
+
+    def free(x, y):
+        return data[y][x] == tile and not covered[y][x]
+
+    rects = []
+    for y, x in it.product(range(rows), range(cols)):
+        if not free(x, y):
+            continue
+
+        w = 1
+        while x + w < cols and free(x + w, y):
+            w += 1
+        h = 1
+        while y + h < rows and all(free(i, y + h) for i in range(x, x + w)):
+            h += 1
+
+        for j, i in it.product(range(y, y + h), range(x, x + w)):
+            covered[j][i] = True
+        rects.append((x, y, w, h))
+    return rects
+
+
+class PathCache:
+    """ Least recently used cache of paths keyed on (start node, goal node) """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+        # -- key -> (path, tile bounds of the path or None if it is empty)
+        self._paths = OrderedDict()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def get(self, key):
+        entry = self._paths.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._paths.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, path, tiles):
+        bounds = None
+        if tiles:
+            xs, ys = [t[0] for t in tiles], [t[1] for t in tiles]
+            bounds = (min(xs), min(ys), max(xs), max(ys))
+
+        self._paths[key] = (path, bounds)
+        self._paths.move_to_end(key)
+        if len(self._paths) > self.size:
+            self._paths.popitem(last=False)
+
+    def invalidate(self, region=None):
+        """ Drop every path, or only those whose bounds overlap region
+
+        region is (x0, y0, x1, y1) in tiles. Empty (unreachable) paths are
+        always dropped, a changed tile may have opened the way.
+        """
+        if region is None:
+            self._paths.clear()
+            return
+
+        x0, y0, x1, y1 = region
+        for key, (_, bounds) in list(self._paths.items()):
+            if bounds is None:
+                del self._paths[key]
+                continue
+
+            bx0, by0, bx1, by1 = bounds
+            if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                del self._paths[key]
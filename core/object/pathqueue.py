@@ -0,0 +1,211 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import time
+import queue
+import threading
+from collections import deque
+from .flowfield import FlowField
+
+
+class PathRequest:
+    """ Handle to a path that is being searched for
+
+    path is None until the search is done, then it holds the same waypoints
+    Map.find_path would have returned ([] if the goal cannot be reached).
+    If the search raised, error holds the exception and path is [].
+    With a radius the path is smoothed for an agent of that size.
+    """
+
+    def __init__(self, start, goal, key=None, radius=None):
+        self.start = start
+        self.goal = goal
+        self.key = key
+        self.radius = radius
+        self.path = None
+        self.cancelled = False
+        self.error = None
+
+        self._search = None
+        self._result = None
+        self._generation = None
+
+    def _get_ready(self):
+        return self.path is not None
+
+    ready = property(_get_ready)
+
+    def cancel(self):
+        """ Drop the request, its path will never be searched or delivered """
+        self.cancelled = True
+
+    def _finish(self, path):
+        self.path = path
+        self._search = None
+
+    def _start(self, navmap):
+        """ Resumable search for this request on navmap """
+        return navmap.search(self.start, self.goal, self.radius)
+
+
+class FieldRequest(PathRequest):
+    """ Handle to a flow field towards the goal node that is being built """
+
+    def __init__(self, goal):
+        super(FieldRequest, self).__init__(None, goal, key=goal)
+
+    def _get_field(self):
+        return self.path
+
+    field = property(_get_field)
+
+    def _start(self, navmap):
+        return FlowField(navmap, self.goal, build=False).build()
+
+
+class PathQueue:
+    """ Search requested paths a little every frame
+
+    Searches are resumable generators (see Astar.search and FlowField.build),
+    so process() can stop in the middle of one when the frame budget (in
+    microseconds) is spent and pick it up again next frame. With
+    threaded=True the searches run on a worker thread instead, and process()
+    only hands out results.
+
+    Every search remembers the generation of the grid it started on, see
+    restart(). Results from an older grid are searched again, never delivered.
+    The worker expands nodes while holding lock, whoever changes the grid
+    holds it too.
+    """
+
+    # -- expanded nodes between two looks at the clock
+    CHUNK = 32
+
+    def __init__(self, navmap, budget=1000, threaded=False):
+        self.navmap = navmap
+        self.budget = budget
+        self.threaded = threaded
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        self._pending = deque()
+        self._finished = deque()
+        if threaded:
+            self._requests = queue.Queue()
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, request):
+        self._pending.append(request)
+        if self.threaded:
+            self._requests.put(request)
+        return request
+
+    def process(self):
+        """ Advance pending searches, return the requests finished since last call """
+        if not self.threaded:
+            deadline = time.perf_counter() + self.budget / 1e6
+            while self._pending and time.perf_counter() < deadline:
+                request = self._pending[0]
+                if request.cancelled or self._advance(request):
+                    self._pending.popleft()
+                    self._finished.append(request)
+        else:
+            # -- the worker skips cancelled requests, forget them here too
+            self._pending = deque(r for r in self._pending if not r.cancelled)
+
+        finished = []
+        while self._finished:
+            request = self._finished.popleft()
+            if request.cancelled:
+                continue
+            if self.threaded:
+                if request._generation != self.generation:
+                    # -- searched on a grid that has changed since, go again
+                    self._requests.put(request)
+                    continue
+                # -- paths are delivered on the calling thread only
+                self._pending.remove(request)
+                request._finish(request._result)
+            finished.append(request)
+        return finished
+
+    def restart(self):
+        """ Start searches in progress over, the grid they run on has changed """
+        self.generation += 1
+        for request in self._pending:
+            request._search = None
+
+    def clear(self):
+        """ Cancel every pending request """
+        for request in self._pending:
+            request.cancel()
+        self._pending.clear()
+
+    def close(self):
+        """ Cancel every pending request and stop the worker thread """
+        self.clear()
+        if self.threaded:
+            self._requests.put(None)
+
+    def _advance(self, request):
+        """ Expand a chunk of nodes for request, True once it has a path """
+        if request._search is None:
+            request._generation = self.generation
+            request._search = request._start(self.navmap)
+        try:
+            for _ in range(self.CHUNK):
+                next(request._search)
+        except StopIteration as done:
+            request._finish(done.value)
+            return True
+        return False
+
+    def _work(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            if request.cancelled:
+                continue
+
+            request.error = None
+            try:
+                request._result = self._search(request)
+            except Exception as e:
+                # -- never let one search take the worker down with it
+                request.error = e
+                request._result = []
+            self._finished.append(request)
+
+    def _search(self, request):
+        # -- the grid may change under a running search (Map.set_tile),
+        # a search that falls behind starts over on the new one
+        search = None
+        while True:
+            with self.lock:
+                if request._generation != self.generation:
+                    request._generation = self.generation
+                    search = request._start(self.navmap)
+                try:
+                    for _ in range(self.CHUNK):
+                        next(search)
+                except StopIteration as done:
+                    return done.value
@@ -19,42 +19,104 @@ import math
 import pymunk as pm
 import pyglet as pg
 from resources import Resources
-from core.math import Vec2
+from core.math import lerp
+from core.app import Application
+from core.render import RenderWorld
+from .bullets import BulletSystem
+from core.pool import Pool
 from core.collection import Collection
-from core.physics import PhysicsWorld, PhysicsBody
+from core.physics import PhysicsWorld, PhysicsBody, COLLISION_BULLET
 from core.utils import image_set_size, image_set_anchor_center
 
+# -- destroyed projectiles kept to be fired again, past this many they are freed
+PROJECTILE_POOL = 256
 
-def ProjectileCollection():
-    return Collection(Projectile)
+
+class ProjectileCollection(Collection):
+    """ Projectiles fired by one owner """
+
+    def __init__(self):
+        super(ProjectileCollection, self).__init__(Projectile.pool.lease)
+
+    def add(self, position, direction, tag=""):
+        """ Fire a projectile, into the bullet system when there is one """
+        bullets = BulletSystem.instance
+        if bullets:
+            bullets.fire(position, direction, tag)
+        else:
+            super(ProjectileCollection, self).add(position, direction, tag=tag)
+
+    def on_update(self, dt):
+        items = self._items
+        super(ProjectileCollection, self).on_update(dt)
+
+        # -- only dropped projectiles go back, so none is in two collections
+        if len(items) != len(self._items):
+            for projectile in items:
+                if projectile.destroyed:
+                    Projectile.pool.release(projectile)
+
+    def destroy(self):
+        """ Take the projectiles in flight out of the world, once their owner
+        is gone, and hand them all back to the pool
+        """
+        for projectile in self._items:
+            if not projectile.destroyed:
+                projectile.destroy()
+            Projectile.pool.release(projectile)
+        self._items = []
+        self._dispatch.invalidate()
 
 
 class Projectile:
+    """ Bullet with a sprite and a physics body, leased from Projectile.pool
+
+    Destroying one only takes it out of the world, its sprite, body and
+    shape are kept and reset when it is leased again.
+    """
+
     SIZE = (15, 15)
     SPEED = 400
 
-    def __init__(self, position, direction, batch, tag=""):
-        self.batch = batch
-        self.direction = direction
-        self.destroyed = False
-
+    def __init__(self, position, direction, tag=""):
         # -- sprite
-        self.image = Resources.instance.sprite("bullet")
-        image_set_size(self.image, *self.SIZE)
-        image_set_anchor_center(self.image)
-        self.sprite = pg.sprite.Sprite(self.image, *position, batch=self.batch)
+        self.sprite = None
+        if not Application.instance.headless:
+            self.image = Resources.instance.sprite("bullet")
+            image_set_size(self.image, *self.SIZE)
+            image_set_anchor_center(self.image)
+            world = RenderWorld.instance
+            self.sprite = pg.sprite.Sprite(
+                self.image, *position, batch=world.batch, group=world.group("bullets")
+            )
 
         # -- physics
-        physics = PhysicsWorld.instance
         self.body = PhysicsBody(1, pm.moment_for_box(1, self.SIZE))
         self.shape = pm.Poly.create_box(self.body, self.SIZE, radius=0.6)
         self.shape.filter = pm.ShapeFilter(categories=0x1)
+        self.reset(position, direction, tag)
+
+    def reset(self, position, direction, tag=""):
+        """ Put the projectile back in the world, fired from position """
+        self.direction = direction
+        self.destroyed = False
 
         self.body.tag = tag
         self.body.position = position
+        self.body.velocity = (0, 0)
+        self.body.angular_velocity = 0
+
+        # -- a zero step drops the bias velocity a body removed mid-step keeps
+        pm.Body.update_position(self.body, 0)
+        self._position = self._last_position = self.body.position
+        if self.sprite:
+            self.sprite.position = position
+            self.sprite.visible = True
+
+        physics = PhysicsWorld.instance
         physics.add(self.body, self.shape)
         physics.register_collision(
-            self.shape.collision_type, self.on_collision_enter, lambda other: None
+            self.shape, COLLISION_BULLET, self.on_collision_enter, lambda other: None
         )
 
     def on_collision_enter(self, other):
@@ -70,11 +132,33 @@ class Projectile:
     def on_update(self, dt):
         self.body.velocity = self.direction * self.SPEED * dt
         self.body.angle = self.direction.angle
-        if self.sprite.image:
+        self._last_position = self._position
+        self._position = self.body.position
+
+    def on_draw(self):
+        """ Place the sprite between the last two steps, the world draws it """
+        if self.sprite and self.sprite.image:
+            alpha = Application.instance.alpha
+            (lx, ly), (x, y) = self._last_position, self._position
+
             # pyglet rotates clockwise (pymunk anti-clockwise)
-            self.sprite.update(*self.body.position, -math.degrees(self.direction.angle))
+            self.sprite.update(
+                lerp(lx, x, alpha),
+                lerp(ly, y, alpha),
+                -math.degrees(self.direction.angle),
+            )
 
     def destroy(self):
-        PhysicsWorld.remove(self.body, self.shape)
-        self.sprite.delete()
+        PhysicsWorld.instance.remove(self.body, self.shape)
+        if self.sprite:
+            self.sprite.visible = False
         self.destroyed = True
+
+    def dispose(self):
+        """ Free the sprite, once the pool will not keep the projectile """
+        if self.sprite:
+            self.sprite.delete()
+            self.sprite = None
+
+
+Projectile.pool = Pool(Projectile, cap=PROJECTILE_POOL)
@@ -0,0 +1,192 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import os
+import pickle
+import hashlib
+
+# -- bump when the baked format or the visibility rules change
+VISIBILITY_VERSION = 2
+
+# -- tiles are only related to tiles at most this many tiles away
+VISIBILITY_RANGE = 5
+
+
+class VisibilityTable:
+    """ Clear view set of every floor tile, baked from level data
+
+    Each tile keeps a bitset over the tiles around it (up to range tiles
+    away) that every point of it sees. A line of sight between two points
+    in such tiles is then known from the tiles alone; anything else needs
+    an exact test, since no wall between two tiles proves that all of
+    their points are hidden from each other.
+    """
+
+    def __init__(self, data, node_size, range=VISIBILITY_RANGE):
+        self.node_size = node_size
+        self.range = range
+        self.width = len(data[0])
+        self.height = len(data)
+        self.digest = map_digest(data)
+
+        w, h = self.width, self.height
+        self._grid = bytearray(w * h)
+        for y, row in enumerate(data):
+            for x, d in enumerate(row):
+                self._grid[y * w + x] = d == " "
+
+        self._clear = [0] * (w * h)
+        self._build(0, 0, w, h)
+
+    @classmethod
+    def for_level(cls, data, node_size, path):
+        """ Load the table baked at path, or bake it there if it is missing or stale """
+        table = cls.load(path, data)
+        if table is None:
+            table = cls(data, node_size)
+            try:
+                table.save(path)
+            except OSError as e:
+                print(f"Could not save visibility table {path}: {e}")
+        return table
+
+    @classmethod
+    def load(cls, path, data):
+        """ Table saved at path, None if there is none for this level data """
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            table = pickle.load(f)
+
+        if table.get("version") != VISIBILITY_VERSION:
+            return None
+        if table.get("digest") != map_digest(data):
+            return None
+
+        obj = cls.__new__(cls)
+        obj.__dict__.update(table["state"])
+        return obj
+
+    def save(self, path):
+        state = dict(self.__dict__)
+        with open(path, "wb") as f:
+            pickle.dump(
+                {"version": VISIBILITY_VERSION, "digest": self.digest, "state": state},
+                f,
+            )
+
+    def lookup(self, p1, p2):
+        """ Line of sight between world positions p1 and p2, through walls only
+
+        True when the tiles prove it, None when an exact test is needed
+        (tiles out of range, not fully in view or inside a wall).
+        """
+        nx, ny = self.node_size
+        ax, ay = int(p1[0] // nx), int(p1[1] // ny)
+        bx, by = int(p2[0] // nx), int(p2[1] // ny)
+        r = self.range
+        if abs(ax - bx) > r or abs(ay - by) > r:
+            return None
+        if not (0 <= ax < self.width and 0 <= ay < self.height):
+            return None
+        if not (0 <= bx < self.width and 0 <= by < self.height):
+            return None
+
+        w = self.width
+        a, b = ay * w + ax, by * w + bx
+        if not (self._grid[a] and self._grid[b]):
+            return None
+
+        bit = 1 << self._bit(bx - ax, by - ay)
+        if self._clear[a] & bit:
+            return True
+        return None
+
+    def update(self, x, y, walkable):
+        """ Change tile x, y and rebake every tile whose view it may touch """
+        self._grid[y * self.width + x] = walkable
+        self.digest = None
+        r = self.range
+        self._build(x - r - 1, y - r - 1, x + r + 2, y + r + 2)
+
+    def _bit(self, dx, dy):
+        size = 2 * self.range + 1
+        return (dy + self.range) * size + (dx + self.range)
+
+    def _build(self, x0, y0, x1, y1):
+        """ Bake tiles in the rect x0, y0, x1, y1 (exclusive) against their range """
+        w, h, r, grid = self.width, self.height, self.range, self._grid
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, w), min(y1, h)
+
+        # -- visibility goes both ways, pairs seen from their other tile are reused
+        pairs = {}
+        for ay in range(y0, y1):
+            for ax in range(x0, x1):
+                a = ay * w + ax
+                clear = 0
+                if grid[a]:
+                    for by in range(max(ay - r, 0), min(ay + r + 1, h)):
+                        for bx in range(max(ax - r, 0), min(ax + r + 1, w)):
+                            b = by * w + bx
+                            if not grid[b]:
+                                continue
+
+                            seen = pairs.pop((b, a), None)
+                            if seen is None:
+                                seen = self._tiles_clear(ax, ay, bx, by)
+                                pairs[(a, b)] = seen
+
+                            if seen:
+                                clear |= 1 << self._bit(bx - ax, by - ay)
+                self._clear[a] = clear
+
+    def _tiles_clear(self, ax, ay, bx, by):
+        """ True if every segment between tiles a and b misses all walls
+
+        That is the case when the segment between the tile centers never gets
+        closer than a tile (on both axes) to a wall center. On the grid of tile
+        centers, it must not cross any cell that has a wall on a corner.
+        """
+        w, grid = self.width, self._grid
+        if ax == bx or ay == by:
+            # -- along a row or column, only the tiles on it matter
+            return all(
+                grid[y * w + x]
+                for y in range(min(ay, by), max(ay, by) + 1)
+                for x in range(min(ax, bx), max(ax, bx) + 1)
+            )
+
+        if ax > bx:
+            ax, ay, bx, by = bx, by, ax, ay
+        dx, dy = bx - ax, by - ay
+        for i in range(ax, bx):
+            # -- y range of the segment over this column, in units of 1 / dx
+            n0 = ay * dx + (i - ax) * dy
+            n1 = n0 + dy
+            lo, hi = min(n0, n1), max(n0, n1)
+            for j in range(lo // dx, -(-hi // dx)):
+                # -- the cell between tile centers i, j and i + 1, j + 1
+                c = j * w + i
+                if not (grid[c] and grid[c + 1] and grid[c + w] and grid[c + w + 1]):
+                    return False
+        return True
+
+
+def map_digest(data):
+    """ Hash of level map data, to tell if a baked table still fits it """
+    text = "\n".join("".join(row) for row in data)
+    return hashlib.sha1(text.encode()).hexdigest()
@@ -15,12 +15,33 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+import math
 import pymunk as pm
 import itertools as it
+from collections import Counter
 from pymunk import pyglet_util as putils
+from core.math import clamp
 
 DEBUG = 0
-PHYSICS_STEPS = 60
+
+# -- physics time simulated every update, velocities are set per update (speed * dt)
+PHYSICS_TIME = 1.0
+
+# -- substeps per update, bodies may move STEP_FRACTION of the smallest collider a step
+MIN_STEPS = 1
+MAX_STEPS = 60
+STEP_FRACTION = 0.25
+
+# -- collision categories (shape collision types), each has a single handler
+COLLISION_PLAYER = 1
+COLLISION_ENEMY = 2
+COLLISION_BULLET = 3
+COLLISION_WALL = 4
+HANDLED_CATEGORIES = (
+    COLLISION_PLAYER,
+    COLLISION_ENEMY,
+    COLLISION_BULLET,
+)
 
 
 class PhysicsWorld:
@@ -28,22 +49,56 @@ class PhysicsWorld:
     # -- singleton
     instance = None
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if PhysicsWorld.instance is None:
             PhysicsWorld.instance = object.__new__(cls)
         return PhysicsWorld.instance
 
-    def __init__(self):
+    def __init__(self, max_steps=MAX_STEPS):
         self.space = pm.Space()
-        self.collision_type = it.count()
+
+        # -- body -> (on_enter, on_exit) of its owner, for every category
+        self._owners = {category: dict() for category in HANDLED_CATEGORIES}
+        for category in HANDLED_CATEGORIES:
+            self._add_category_handler(category)
+
+        # -- substeps taken by the last update, and in total
+        self.max_steps = max_steps
+        self.steps = 0
+        self.total_steps = 0
+
+        # -- sizes of all solid colliders, to find the smallest
+        self._shape_sizes = dict()
+        self._sizes = Counter()
 
     def add(self, *args):
         for obj in args:
             if isinstance(obj, pm.Shape):
-                obj.collision_type = next(self.collision_type)
+                bb = obj.cache_bb()
+                size = min(bb.right - bb.left, bb.top - bb.bottom)
+                if not obj.sensor and size > 0:
+                    self._shape_sizes[obj] = size
+                    self._sizes[size] += 1
         self.space.add(*args)
 
     def remove(self, *args):
+        for obj in _flatten(args):
+            if isinstance(obj, pm.Body):
+                # -- drop dead owners so their callbacks are released
+                for owners in self._owners.values():
+                    owners.pop(obj, None)
+                continue
+            if not isinstance(obj, pm.Shape):
+                continue
+
+            if obj.collision_type in self._owners:
+                self._owners[obj.collision_type].pop(obj.body, None)
+
+            size = self._shape_sizes.pop(obj, None)
+            if size is not None:
+                self._sizes[size] -= 1
+                if not self._sizes[size]:
+                    del self._sizes[size]
         self.space.remove(*args)
 
     def clear(self):
@@ -52,22 +107,50 @@ class PhysicsWorld:
             self.remove(body, body.shapes)
 
     def on_update(self, dt):
-        for _ in it.repeat(None, PHYSICS_STEPS):
-            self.space.step(1.0 / PHYSICS_STEPS)
-
-    def register_collision(self, _type, on_enter, on_exit):
-        handler = self.space.add_wildcard_collision_handler(_type)
+        self.steps = self._substeps()
+        self.total_steps += self.steps
+        for _ in it.repeat(None, self.steps):
+            self.space.step(PHYSICS_TIME / self.steps)
+
+    def _substeps(self):
+        """ Fewest steps in which no body moves more than STEP_FRACTION of the
+        smallest collider, so fast bodies cannot tunnel through thin ones.
+        """
+        speed_sqrd = max(
+            (b.velocity.get_length_sqrd() for b in self.space.bodies), default=0
+        )
+        if not speed_sqrd or not self._sizes:
+            return MIN_STEPS
+
+        travel = math.sqrt(speed_sqrd) * PHYSICS_TIME
+        steps = math.ceil(travel / (min(self._sizes) * STEP_FRACTION))
+        return clamp(steps, MIN_STEPS, self.max_steps)
+
+    def register_collision(self, shape, category, on_enter, on_exit):
+        """ Put shape in a collision category, on_enter(other_body) and
+        on_exit(other_body) are called when it starts and stops touching shapes.
+        """
+        shape.collision_type = category
+        self._owners[category][shape.body] = (on_enter, on_exit)
+
+    def _add_category_handler(self, category):
+        handler = self.space.add_wildcard_collision_handler(category)
+        owners = self._owners[category]
 
         def handler_begin(arbiter, space, data):
             this, other = arbiter.shapes
-            on_enter(other.body)
+            callbacks = owners.get(this.body)
+            if callbacks:
+                callbacks[0](other.body)
             return True
 
         handler.begin = handler_begin
 
         def handler_separate(arbiter, space, data):
             this, other = arbiter.shapes
-            on_exit(other.body)
+            callbacks = owners.get(this.body)
+            if callbacks:
+                callbacks[1](other.body)
 
         handler.separate = handler_separate
 
@@ -80,6 +163,15 @@ class PhysicsWorld:
         self.space.reindex_shapes_for_body(b)
 
 
+def _flatten(objs):
+    """ Yield the shapes, bodies and constraints in (nested lists of) objs """
+    for obj in objs:
+        if isinstance(obj, (pm.Shape, pm.Body, pm.Constraint)):
+            yield obj
+        else:
+            yield from _flatten(obj)
+
+
 class PhysicsBody(pm.Body):
     """ Convinience class for tagging physics bodies """
 
@@ -0,0 +1,64 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+
+class Pool:
+    """ Objects kept after use, to be leased again instead of created
+
+    lease(*args) makes an object with create(*args), or takes a free one
+    and calls its reset(*args). Released objects are kept up to cap, past
+    that their dispose() is called to free what they hold.
+    """
+
+    def __init__(self, create, cap=256):
+        self._create = create
+        self._free = []
+        self.cap = cap
+
+        # -- objects leased now, and the most that ever were at once
+        self.in_use = 0
+        self.high_water = 0
+        self.created = 0
+
+    def __len__(self):
+        return len(self._free)
+
+    def lease(self, *args, **kwargs):
+        if self._free:
+            obj = self._free.pop()
+            obj.reset(*args, **kwargs)
+        else:
+            obj = self._create(*args, **kwargs)
+            self.created += 1
+
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return obj
+
+    def release(self, obj):
+        self.in_use -= 1
+        if len(self._free) < self.cap:
+            self._free.append(obj)
+        else:
+            obj.dispose()
+
+    def clear(self):
+        """ Dispose of the free objects, and forget those leased """
+        for obj in self._free:
+            obj.dispose()
+        self._free.clear()
+        self.in_use = 0
@@ -0,0 +1,127 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import math
+from collections import defaultdict
+
+# -- side of a hash cell, about the largest radius queried
+CELL_SIZE = 256
+
+
+class Proximity:
+    """ Uniform spatial hash of tracked bodies, rebuilt every update
+
+    Answers which bodies of a tag are within a radius of a point, and calls
+    watchers back when bodies of a tag come within, or leave, their radius.
+    Bodies overlap a radius when their circle (of the tracked radius) does.
+    """
+
+    # -- singleton
+    instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if Proximity.instance is None:
+            Proximity.instance = object.__new__(cls)
+        return Proximity.instance
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+
+        # -- body -> (tag, radius) and tag -> {cell: [bodies]}
+        self._bodies = dict()
+        self._cells = defaultdict(lambda: defaultdict(list))
+        self._max_radius = 0
+
+        # -- body -> [tag, radius, on_enter, on_exit, bodies inside last update]
+        self._watchers = dict()
+
+    def track(self, body, radius=0, tag=None):
+        """ Hash body from the next update, by tag or else its body.tag then """
+        self._bodies[body] = (tag, radius)
+        self._max_radius = max(self._max_radius, radius)
+
+    def untrack(self, body):
+        """ Stop hashing body, watchers see it leave on the next update """
+        self._bodies.pop(body, None)
+
+    def watch(self, body, tag, radius, on_enter, on_exit):
+        """ Call on_enter(other) and on_exit(other) when bodies of tag come
+        within, and leave, radius of body.
+        """
+        self._watchers[body] = [tag, radius, on_enter, on_exit, dict()]
+
+    def unwatch(self, body):
+        self._watchers.pop(body, None)
+
+    def query(self, tag, position, radius):
+        """ Bodies of tag within radius of position """
+        cs = self.cell_size
+        cells = self._cells.get(tag)
+        if not cells:
+            return []
+
+        px, py = position
+        reach = radius + self._max_radius
+        x0, x1 = math.floor((px - reach) / cs), math.floor((px + reach) / cs)
+        y0, y1 = math.floor((py - reach) / cs), math.floor((py + reach) / cs)
+
+        found = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for body, (x, y), size in cells.get((cx, cy), ()):
+                    dist = radius + size
+                    if (x - px) ** 2 + (y - py) ** 2 < dist * dist:
+                        found.append(body)
+        return found
+
+    def on_update(self, dt):
+        self._rebuild()
+
+        # -- diff what each watcher sees against the last update
+        for body, watcher in list(self._watchers.items()):
+            tag, radius, on_enter, on_exit, inside = watcher
+            found = dict.fromkeys(self.query(tag, body.position, radius))
+            watcher[4] = found
+
+            for other in inside:
+                if other not in found:
+                    on_exit(other)
+            for other in found:
+                if other not in inside:
+                    on_enter(other)
+
+    def clear(self):
+        self._bodies.clear()
+        self._cells.clear()
+        self._watchers.clear()
+        self._max_radius = 0
+
+    def _rebuild(self):
+        """ Hash every tracked body still in the physics world by position """
+        cs = self.cell_size
+        self._cells.clear()
+        for body, (tag, radius) in list(self._bodies.items()):
+            if body.space is None:
+                # -- the body left the world without being untracked
+                del self._bodies[body]
+                continue
+
+            if tag is None:
+                tag = getattr(body, "tag", None)
+            x, y = body.position
+            key = (math.floor(x / cs), math.floor(y / cs))
+            self._cells[tag][key].append((body, (x, y), radius))
@@ -0,0 +1,52 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import pyglet as pg
+
+# -- layers of the world, drawn bottom first
+WORLD_LAYERS = ("floor", "walls", "entities", "bullets", "effects")
+
+
+class RenderWorld:
+    """ One batch the whole world is drawn from, in ordered layers
+
+    The map, entities and projectiles add their vertex lists to the batch
+    under the group of their layer, and only update them. Drawing it after
+    they did renders the world in a few draw calls.
+    """
+
+    # -- singleton
+    instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if RenderWorld.instance is None:
+            RenderWorld.instance = object.__new__(cls)
+        return RenderWorld.instance
+
+    def __init__(self):
+        self.batch = pg.graphics.Batch()
+        self._groups = {
+            layer: pg.graphics.OrderedGroup(order)
+            for order, layer in enumerate(WORLD_LAYERS)
+        }
+
+    def group(self, layer):
+        """ Group that keeps layer in its place in the draw order """
+        return self._groups[layer]
+
+    def on_draw(self):
+        self.batch.draw()
@@ -15,8 +15,10 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+import time
 import pprint
-import operator as op
+from core.timing import FrameTimer, DRAW, UPDATE
+from core.event import DispatchTable
 
 
 class Scene(object):
@@ -26,6 +28,7 @@ class Scene(object):
         super().__init__()
         self.name = name
         self.objects = dict()
+        self._dispatch = DispatchTable(lambda: self.objects.items())
 
     def __repr__(self):
         return "Scene<name={}, {}>".format(self.name, pprint.pformat(self.objects))
@@ -34,6 +37,7 @@ class Scene(object):
         if name in self.objects.keys():
             raise ValueError(f"Object with name '{name}' already exists!")
         self.objects[name] = obj
+        self._dispatch.add(name, obj)
 
     def add_many(self, **kwargs):
         for key, val in kwargs.items():
@@ -47,10 +51,20 @@ class Scene(object):
 
     def _iter_call_meth(self, method, *args, **kwargs):
         """ Call meth on this object's __iter__ """
-        for obj in self:
-            if hasattr(obj, method):
-                f = op.methodcaller(method, *args, **kwargs)
-                f(obj)
+        timer = FrameTimer.instance
+        if timer and timer.enabled:
+            self._timed_call_meth(timer, method, *args, **kwargs)
+            return
+
+        for _, handler in self._dispatch.handlers(method):
+            handler(*args, **kwargs)
+
+    def _timed_call_meth(self, timer, method, *args, **kwargs):
+        """ Call meth like _iter_call_meth, recording the time each object takes """
+        for name, handler in self._dispatch.handlers(method):
+            start = time.perf_counter()
+            handler(*args, **kwargs)
+            timer.record(name, method, time.perf_counter() - start)
 
     # XXX Event handlers
     def on_draw(self):
@@ -58,16 +72,25 @@ class Scene(object):
         self._iter_call_meth("on_draw")
         self._iter_call_meth("on_draw_last")
 
+        timer = FrameTimer.instance
+        if timer and timer.enabled:
+            timer.end_frame(DRAW)
+
     def on_update(self, dt):
         self._iter_call_meth("on_update", dt)
 
         # -- remove all destroyed objects from the scene
-        self.objects = {
-            k: v
-            for k, v in self.objects.items()
-            if (hasattr(v, "destroyed") and not v.destroyed)
-            or not hasattr(v, "destroyed")
-        }
+        destroyed = [
+            k for k, v in self.objects.items() if getattr(v, "destroyed", False)
+        ]
+        if destroyed:
+            for k in destroyed:
+                del self.objects[k]
+            self._dispatch.invalidate()
+
+        timer = FrameTimer.instance
+        if timer and timer.enabled:
+            timer.end_frame(UPDATE)
 
     def on_resize(self, *args):
         self._iter_call_meth("on_resize", *args)
@@ -0,0 +1,197 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import json
+import pyglet as pg
+from collections import defaultdict, deque
+
+from core.app import Application
+from core.utils import reset_matrix
+
+
+def percentile(ordered, pct):
+    """ Nearest-rank percentile of an already sorted sequence """
+    if not ordered:
+        return 0.0
+    idx = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[min(idx, len(ordered) - 1)]
+
+
+def summary(samples):
+    """ p50/p95/p99/max milliseconds and count of per frame samples in seconds """
+    ordered = sorted(samples)
+    return {
+        "p50": percentile(ordered, 50) * 1000,
+        "p95": percentile(ordered, 95) * 1000,
+        "p99": percentile(ordered, 99) * 1000,
+        "max": ordered[-1] * 1000 if ordered else 0.0,
+        "frames": len(ordered),
+    }
+
+
+# -- draws and fixed step updates do not happen at the same rate, so each
+# kind of frame is summed on its own
+UPDATE, DRAW = "update", "draw"
+
+
+def phase(method):
+    """ Kind of frame a handler is timed in, DRAW for the on_draw* handlers """
+    return DRAW if method.startswith("on_draw") else UPDATE
+
+
+class FrameTimer:
+    """ Record wall time spent in every (object, handler) pair each frame
+
+    Scene and Collection time their event dispatch while an enabled instance
+    exists. Handler times are summed per frame, and the last `window` frames
+    are kept for percentiles. Update and draw frames are kept apart: an
+    update frame ends on every Scene.on_update, a draw frame on every
+    Scene.on_draw, and a drawn frame may run any number of updates.
+    Collection items are recorded per type (e.g. Enemy[*]) as nested
+    records: their time is already part of the collection's own record, so
+    the frame totals only add up the others.
+    """
+
+    # -- singleton
+    instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if FrameTimer.instance is None:
+            FrameTimer.instance = object.__new__(cls)
+        return FrameTimer.instance
+
+    def __init__(self, window=300):
+        self.enabled = True
+        self.window = window
+        self.frames = 0
+
+        self._frame = {UPDATE: defaultdict(float), DRAW: defaultdict(float)}
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._nested = set()
+        self._totals = {
+            UPDATE: deque(maxlen=self.window),
+            DRAW: deque(maxlen=self.window),
+        }
+
+    def record(self, name, method, seconds, nested=False):
+        """ Add seconds spent in name.method this frame, nested if they are
+        also counted in the record of whatever called it
+        """
+        self._frame[phase(method)][name, method] += seconds
+        if nested:
+            self._nested.add((name, method))
+
+    def end_frame(self, kind=UPDATE):
+        """ Close the current frame of kind (UPDATE or DRAW) """
+        frame = self._frame[kind]
+        total = 0.0
+        for key, seconds in frame.items():
+            self._samples[key].append(seconds)
+            if key not in self._nested:
+                total += seconds
+        self._totals[kind].append(total)
+        frame.clear()
+        if kind == UPDATE:
+            self.frames += 1
+
+    def clear(self):
+        for kind in (UPDATE, DRAW):
+            self._frame[kind].clear()
+            self._totals[kind].clear()
+        self._samples.clear()
+        self._nested.clear()
+        self.frames = 0
+
+    def stats(self):
+        """ Map 'name.handler' to p50/p95/p99/max milliseconds, slowest p99 first
+
+        Nested records are flagged, they must not be added to the others.
+        """
+        result = {}
+        for (name, method), samples in self._samples.items():
+            result[f"{name}.{method}"] = dict(
+                summary(samples), nested=(name, method) in self._nested
+            )
+        return dict(sorted(result.items(), key=lambda kv: -kv[1]["p99"]))
+
+    def total(self, kind=UPDATE):
+        """ p50/p95/p99/max milliseconds of whole frames of kind, nested
+        records left out
+        """
+        return summary(self._totals[kind])
+
+    def report(self, limit=None):
+        """ Format stats as a text table, nested records indented under the totals """
+        lines = [f"{'handler':<40}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        rows = [("update total", self.total(UPDATE))]
+        if self._totals[DRAW]:
+            rows.append(("draw total", self.total(DRAW)))
+        rows += [
+            (f"  {key}" if st["nested"] else key, st)
+            for key, st in list(self.stats().items())[:limit]
+        ]
+        for key, st in rows:
+            times = "".join(f"{st[k]:9.3f}" for k in ("p50", "p95", "p99", "max"))
+            lines.append(f"{key:<40}{times}")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """ Write stats as json to path, or print the text table """
+        if path:
+            with open(path, "w") as f:
+                json.dump(self.stats(), f, indent=2)
+        else:
+            print(self.report())
+
+
+class FrameTimerOverlay:
+    """ Show the slowest handlers of FrameTimer.instance, toggled with F3 """
+
+    def __init__(self, limit=15, refresh=30):
+        self.limit = limit
+        self.refresh = refresh
+        self._show = False
+        self._counter = 0
+        self._label = pg.text.Label(
+            "",
+            font_name="Courier New",
+            font_size=10,
+            color=(255, 255, 255, 255),
+            multiline=True,
+            width=600,
+            anchor_y="top",
+        )
+        self.on_resize(*Application.instance.size)
+
+    def on_resize(self, w, h):
+        self._label.x = w - self._label.width - 10
+        self._label.y = h - 10
+
+    def on_update(self, dt):
+        self._counter += 1
+        timer = FrameTimer.instance
+        if self._show and timer and self._counter % self.refresh == 0:
+            self._label.text = timer.report(self.limit)
+
+    def on_draw_last(self):
+        if self._show:
+            with reset_matrix(*Application.instance.size):
+                self._label.draw()
+
+    def on_key_press(self, symbol, mod):
+        if symbol == pg.window.key.F3:
+            self._show = not self._show
@@ -17,13 +17,13 @@
 
 import os
 import pickle
-import operator
 import pyglet as pg
 from pyglet.gl import *
 from contextlib import contextmanager
 
 from core.math import clamp
 from core.app import Application
+from core.event import DispatchTable
 from resources import LevelData, Resources, sorted_levels
 from core.utils import (
     set_flag,
@@ -41,6 +41,7 @@ class Editor:
         self.levels = Resources.instance.levels()
         self.current = sorted_levels(0) if len(self.levels) else None
         self.data = dict()
+        self._dispatch = DispatchTable(lambda: ((obj, obj) for obj in self))
         self.load()
 
     def load(self):
@@ -52,6 +53,7 @@ class Editor:
         self.topbar = EditorTopbar(self.levels)
         self.toolbar = EditorToolbar(self.data)
         self.viewport = EditorViewport(self.data)
+        self._dispatch.invalidate()
 
         # -- hook events
         self.topbar.new_btn.on_click(self.new)
@@ -70,6 +72,7 @@ class Editor:
         self.topbar.add_tab(self.current)
         self.toolbar = EditorToolbar(self.data)
         self.viewport = EditorViewport(self.data)
+        self._dispatch.invalidate()
 
     def save(self):
         # -- remove temp data from self.data
@@ -95,10 +98,8 @@ class Editor:
         return iter([self.viewport, self.toolbar, self.topbar])
 
     def _iter_call_meth(self, meth, *args, **kwargs):
-        for obj in self:
-            if hasattr(obj, meth):
-                caller = operator.methodcaller(meth, *args, **kwargs)
-                caller(obj)
+        for _, handler in self._dispatch.handlers(meth):
+            handler(*args, **kwargs)
 
     def on_draw(self):
         self._iter_call_meth("on_draw")
@@ -368,6 +369,7 @@ class EditorToolbar:
         )
         self.tool_settings = {"size": (50, 50), "border": (5, 5), "anchor": (25, 25)}
         self.init_tools()
+        self._dispatch = DispatchTable(lambda: ((tool, tool) for tool in self.tools))
 
     def init_tools(self):
         locx, locy = self.tool_start_loc
@@ -393,10 +395,8 @@ class EditorToolbar:
 
     def _iter_call_meth(self, method, *args, **kwargs):
         """ Call meth on this objects __iter__ """
-        for obj in self:
-            if hasattr(obj, method):
-                f = operator.methodcaller(method, *args, **kwargs)
-                f(obj)
+        for _, handler in self._dispatch.handlers(method):
+            handler(*args, **kwargs)
 
     # XXX Event handlers
     def on_draw(self):
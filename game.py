@@ -16,14 +16,18 @@
 #  MA 02110-1301, USA.
 
 import types
+import argparse
 import pyglet as pg
 
-from resources import Resources
+from resources import Resources, baked_path
 
 from core.scene import Scene
 from core.app import Application
-from core.object import Camera, Map
+from core.object import Camera, Map, BulletSystem, Projectile
 from core.physics import PhysicsWorld
+from core.proximity import Proximity
+from core.render import RenderWorld
+from core.timing import FrameTimer, FrameTimerOverlay
 from core.entity import Player, EnemyCollection
 from core.gui import Label, Frame, HLayout, VLayout, TextButton
 
@@ -66,18 +70,35 @@ class Game(Application):
         levels = Resources.instance.levels()
 
         def _get_scene():
-            level = list(levels.values())[current_level]
+            path, level = list(levels.items())[current_level]
 
             game = Scene("game")
+            world = RenderWorld()
+
+            # -- pooled projectiles hold sprites of the last level's world
+            Projectile.pool.clear()
             game.add("physics", PhysicsWorld())
+            game.add("proximity", Proximity())
             game.add("camera", Camera())
-            game.add("map", Map(level.map))
+            game.add("map", Map(level.map, visibility=baked_path(path, ".pvs")))
+            try:
+                game.add("bullets", BulletSystem(game.map))
+            except ImportError:
+                # -- without numpy every projectile is its own physics body
+                pass
             game.add("player", Player(position=level.player))
             game.add("enemy", EnemyCollection(level.enemies, level.waypoints))
 
+            # -- drawn after everything in it placed its sprites
+            game.add("world", world)
+            if FrameTimer.instance:
+                game.add("timings", FrameTimerOverlay())
+
             # -- setup camera
             game.camera.bounds = (0, 0, *game.map.size)
             game.camera.track(game.player)
+            game.map.camera = game.camera
+            game.enemy.scheduler.track(game.player, game.camera)
             self.scenes.append(game)
             return game
 
@@ -243,9 +264,22 @@ class Game(Application):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Triggered")
+    parser.add_argument("--profile", action="store_true", help="cProfile the game")
+    parser.add_argument(
+        "--timings", action="store_true", help="time event handlers (F3 to show)"
+    )
+    args = parser.parse_args()
+
     Resources()
+    if args.timings:
+        FrameTimer()
+
     game = Game((1280, 720), "Triggered")
-    game.run()
+    game.run(debug=args.profile)
+
+    if args.timings:
+        FrameTimer.instance.dump()
 
 
 if __name__ == "__main__":
@@ -20,6 +20,7 @@ import pickle
 import pyglet as pg
 
 from collections import namedtuple, defaultdict
+from .atlas import SpriteAtlas
 
 Resource = namedtuple("Resource", "name data")
 LevelData = namedtuple(
@@ -33,12 +34,14 @@ class Resources:
     # -- singleton
     instance = None
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if Resources.instance is None:
             Resources.instance = object.__new__(cls)
         return Resources.instance
 
-    def __init__(self):
+    def __init__(self, headless=False):
+        # -- headless: no gl context or audio, so sprites and sounds are not loaded
+        self.headless = headless
         self.root = os.path.dirname(os.path.realpath(__file__))
         pg.resource.path = [os.path.dirname(os.path.realpath(__file__))]
         pg.resource.reindex()
@@ -64,8 +67,8 @@ class Resources:
                 return os.path.join(self._sounds, sound)
 
         for level in os.listdir(self._levels):
-            n = level.split(".")[0]
-            if n == name:
+            n, ext = os.path.splitext(level)
+            if n == name and ext == ".level":
                 return os.path.join(self._levels, level)
         return None
 
@@ -108,21 +111,24 @@ class Resources:
         return level_data
 
     def _load(self):
-
-        # -- load sprites
-        for sprite in os.listdir(self._sprites):
-            img = pg.resource.image("sprites/" + sprite)
-            fn = os.path.basename(sprite.split(".")[0])
-            self._data["sprites"].append(Resource(fn, img))
-
-        # -- load sounds
-        for sound in os.listdir(self._sounds):
-            snd = pg.resource.media("sounds/" + sound)
-            fn = os.path.basename(sound.split(".")[0])
-            self._data["sounds"].append(Resource(fn, snd))
-
-        # -- load levels
+        if not self.headless:
+            # -- load sprites, as regions of atlas pages cached next to them
+            paths = [os.path.join(self._sprites, s) for s in os.listdir(self._sprites)]
+            cache = os.path.join(self.root, "sprites.atlas")
+            atlas = SpriteAtlas.for_files(paths, cache)
+            for fn, img in atlas.images().items():
+                self._data["sprites"].append(Resource(fn, img))
+
+            # -- load sounds
+            for sound in os.listdir(self._sounds):
+                snd = pg.resource.media("sounds/" + sound)
+                fn = os.path.basename(sound.split(".")[0])
+                self._data["sounds"].append(Resource(fn, snd))
+
+        # -- load levels, other files there are data baked from them
         for level in os.listdir(self._levels):
+            if not level.endswith(".level"):
+                continue
             lvl = pg.resource.file("levels/" + level)
             fn = os.path.basename(level.split(".")[0])
             self._data["levels"].append(Resource(fn, lvl))
@@ -147,6 +153,11 @@ class Resources:
                 )
 
 
+def baked_path(level_path, ext):
+    """ Path of data baked from the level file at level_path, kept next to it """
+    return os.path.splitext(level_path)[0] + ext
+
+
 def sorted_levels(idx=None):
     if idx or idx == 0:
         return sorted(
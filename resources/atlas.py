@@ -0,0 +1,160 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import os
+import zlib
+import pickle
+import hashlib
+import pyglet as pg
+from pyglet.image.atlas import Allocator, AllocatorException
+
+# -- bump when the cached format or the packing changes
+ATLAS_VERSION = 1
+
+# -- side of an atlas page, sprites larger than a page keep their own texture
+ATLAS_SIZE = 2048
+
+# -- pixels of its own edge repeated around every sprite, so filtering
+# -- a scaled sprite never samples its neighbours
+ATLAS_BORDER = 2
+
+
+class SpriteAtlas:
+    """ Sprites packed into a few atlas pages, so drawing them binds few textures
+
+    Pages are kept as raw rgba pixels, and cached on disk with the digest of
+    the source files, so later startups neither decode nor pack them again.
+    """
+
+    def __init__(self, paths):
+        self.digest = files_digest(paths)
+
+        # -- page -> (width, height, rgba bytes), name -> (page, x, y, width, height)
+        self._pages = []
+        self._regions = dict()
+        self._pack(paths)
+
+    @classmethod
+    def for_files(cls, paths, cache):
+        """ Load the atlas cached at cache, or pack paths and cache it there """
+        atlas = cls.load(cache, paths)
+        if atlas is None:
+            atlas = cls(paths)
+            try:
+                atlas.save(cache)
+            except OSError as e:
+                print(f"Could not save sprite atlas {cache}: {e}")
+        return atlas
+
+    @classmethod
+    def load(cls, path, paths):
+        """ Atlas saved at path, None if there is none for these source files """
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            atlas = pickle.load(f)
+
+        if atlas.get("version") != ATLAS_VERSION:
+            return None
+        if atlas.get("digest") != files_digest(paths):
+            return None
+
+        obj = cls.__new__(cls)
+        obj.digest = atlas["digest"]
+        obj._regions = atlas["regions"]
+        obj._pages = [(w, h, zlib.decompress(data)) for w, h, data in atlas["pages"]]
+        return obj
+
+    def save(self, path):
+        pages = [(w, h, zlib.compress(data, 1)) for w, h, data in self._pages]
+        with open(path, "wb") as f:
+            pickle.dump(
+                {
+                    "version": ATLAS_VERSION,
+                    "digest": self.digest,
+                    "regions": self._regions,
+                    "pages": pages,
+                },
+                f,
+            )
+
+    def images(self):
+        """ Map sprite names to texture regions of the page textures """
+        textures = [
+            pg.image.ImageData(w, h, "RGBA", data).get_texture()
+            for w, h, data in self._pages
+        ]
+        return {
+            name: textures[page].get_region(x, y, w, h)
+            for name, (page, x, y, w, h) in self._regions.items()
+        }
+
+    def _pack(self, paths):
+        """ Shelf pack the images at paths, tallest first, into pages """
+        images = []
+        for path in paths:
+            img = pg.image.load(path)
+            name = os.path.basename(path).split(".")[0]
+            data = img.get_data("RGBA", img.width * 4)
+            images.append((name, img.width, img.height, data))
+        images.sort(key=lambda i: (-i[2], -i[1], i[0]))
+
+        pad = ATLAS_BORDER
+        allocators, pages = [], []
+        for name, w, h, data in images:
+            for page, allocator in enumerate(allocators):
+                try:
+                    x, y = allocator.alloc(w + pad * 2, h + pad * 2)
+                    break
+                except AllocatorException:
+                    continue
+            else:
+                size = max(ATLAS_SIZE, w + pad * 2, h + pad * 2)
+                allocators.append(Allocator(size, size))
+                pages.append(bytearray(size * size * 4))
+                page = len(allocators) - 1
+                x, y = allocators[page].alloc(w + pad * 2, h + pad * 2)
+
+            _blit_extruded(pages[page], allocators[page].width, data, w, h, x, y, pad)
+            self._regions[name] = (page, x + pad, y + pad, w, h)
+
+        # -- crop pages to the rows in use
+        for allocator, page in zip(allocators, pages):
+            width = allocator.width
+            height = max(s.y2 for s in allocator.strips)
+            self._pages.append((width, height, bytes(page[: width * height * 4])))
+
+
+def _blit_extruded(page, page_width, data, w, h, x, y, pad):
+    """ Copy w x h rgba data to x, y of page, its edges repeated pad pixels out """
+    stride = w * 4
+    rows = [data[i * stride : (i + 1) * stride] for i in range(h)]
+    rows = [rows[0]] * pad + rows + [rows[-1]] * pad
+    for j, row in enumerate(rows):
+        line = row[:4] * pad + row + row[-4:] * pad
+        start = ((y + j) * page_width + x) * 4
+        page[start : start + len(line)] = line
+
+
+def files_digest(paths):
+    """ Hash of the names and contents of files, to tell if a cache still fits them """
+    sha = hashlib.sha1()
+    for path in sorted(paths):
+        sha.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
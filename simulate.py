@@ -0,0 +1,150 @@
+#  Copyright 2019 Ian Karanja <karanjaichungwa@gmail.com
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import pyglet as pg
+
+# -- there is no display to create the gl shadow window on
+pg.options["shadow_window"] = False
+
+import os
+import time
+import argparse
+
+from resources import Resources, baked_path
+
+from core.scene import Scene
+from core.object import Map, BulletSystem, Projectile
+from core.object.map import PATH_ENGINES
+from core.physics import PhysicsWorld
+from core.proximity import Proximity
+from core.timing import FrameTimer
+from core.app import HeadlessApplication
+from core.entity import Player, EnemyCollection
+
+
+class Simulation(HeadlessApplication):
+    """ Run a game level without a window
+
+    The level scene (physics, map, player and enemies) is built exactly as in
+    the game, minus the camera and anything that needs a gl context.
+    """
+
+    def __init__(
+        self, level, size=(1280, 720), pathing="astar", visibility=None, batched=False
+    ):
+        super().__init__(size, "Simulation")
+        self.level = level
+        self.pathing = pathing
+        self.visibility = visibility
+        self.batched = batched
+        self.scene = self._create_scene(level)
+        self.process(self.scene)
+
+    def _create_scene(self, level):
+        sim = Scene("simulation")
+        Projectile.pool.clear()
+        sim.add("physics", PhysicsWorld())
+        sim.add("proximity", Proximity())
+        sim.add("map", Map(level.map, self.pathing, self.visibility))
+        try:
+            sim.add("bullets", BulletSystem(sim.map))
+        except ImportError:
+            # -- without numpy every projectile is its own physics body
+            pass
+        sim.add("player", Player(position=level.player))
+        sim.add("enemy", EnemyCollection(level.enemies, level.waypoints, self.batched))
+        sim.enemy.scheduler.track(sim.player)
+        return sim
+
+
+def level_names():
+    """ Map level names (file names without extension) to level paths and data """
+    return {
+        os.path.basename(path).split(".")[0]: (path, data)
+        for path, data in Resources.instance.levels().items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a level without a window")
+    parser.add_argument("--level", default="level_1", help="name of the level")
+    parser.add_argument("--steps", type=int, default=3600, help="ticks to simulate")
+    parser.add_argument("--dt", type=float, default=1 / 60, help="fixed timestep")
+    parser.add_argument("--profile", action="store_true", help="profile the run")
+    parser.add_argument(
+        "--batched", action="store_true", help="steer enemies in one numpy pass"
+    )
+    parser.add_argument(
+        "--pathing", default="astar", choices=sorted(PATH_ENGINES), help="path search"
+    )
+    parser.add_argument(
+        "--timings",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="time event handlers, print them or write json to PATH",
+    )
+    args = parser.parse_args()
+
+    Resources(headless=True)
+    levels = level_names()
+    if args.level not in levels:
+        parser.error(f"unknown level '{args.level}', choose from {sorted(levels)}")
+
+    if args.timings is not None:
+        FrameTimer()
+
+    path, level = levels[args.level]
+    sim = Simulation(
+        level,
+        pathing=args.pathing,
+        visibility=baked_path(path, ".pvs"),
+        batched=args.batched,
+    )
+    start = time.perf_counter()
+    sim.run(debug=args.profile, steps=args.steps, dt=args.dt)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.steps} ticks in {elapsed:.3f}s ({args.steps / elapsed:.1f} ticks/s)")
+    simulated = args.steps * args.dt
+    print(f"simulated {simulated:.1f}s, {simulated / elapsed:.1f}x realtime")
+
+    world = sim.scene.map
+    print(f"walls {world.wall_tiles} tiles in {world.wall_shapes} colliders")
+    cache = world.path_cache
+    print(f"path cache {cache.hits} hits, {cache.misses} misses, {len(cache)} kept")
+
+    totals = sim.scene.enemy.scheduler.totals
+    tiers = ", ".join(f"{t / args.steps:.1f}" for t in totals)
+    print(f"enemies per tick thinking every 1, 4, 16 ticks: {tiers}")
+
+    physics = sim.scene.physics
+    print(f"physics substeps per tick {physics.total_steps / args.steps:.2f}")
+
+    bullets = sim.scene.bullets
+    if bullets:
+        print(f"bullets {bullets.live} live, {bullets.high_water} at most")
+    else:
+        pool = Projectile.pool
+        print(f"projectiles {pool.created} created, {pool.high_water} in use at most")
+
+    if args.timings is not None:
+        FrameTimer.instance.dump(args.timings or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import pyglet as pg
+
+# -- there is no display to create the gl shadow window on
+pg.options["shadow_window"] = False
@@ -0,0 +1,54 @@
+import pytest
+
+from resources import Resources, LevelData
+from core.object import pathqueue
+from core.object.flowfield import FlowField
+from core.entity.enemy import EnemyState_CHASE
+from simulate import Simulation
+
+ROOM = [
+    "#########",
+    "#       #",
+    "#       #",
+    "#       #",
+    "#########",
+]
+
+
+@pytest.fixture
+def sim():
+    if Resources.instance is None:
+        Resources(headless=True)
+    enemies = [(650, 150), (650, 350)]
+    waypoints = [[p] for p in enemies]
+    level = LevelData(ROOM, "Room", (150, 250), [], enemies, waypoints, [])
+    return Simulation(level)
+
+
+def test_chasers_share_one_flow_field(sim, monkeypatch):
+    builds = []
+
+    class CountedField(FlowField):
+        def build(self):
+            builds.append(self.goal)
+            return (yield from super().build())
+
+    monkeypatch.setattr(pathqueue, "FlowField", CountedField)
+
+    scene = sim.scene
+    chasers = list(scene.enemy)
+    for enemy in chasers:
+        enemy.chase_target = scene.player.body
+        enemy.new_state(EnemyState_CHASE)
+    start = [enemy.position for enemy in chasers]
+
+    sim.run(steps=5)
+
+    assert len(builds) == 1
+    field = scene.map.flow_field(scene.player.position)
+    assert isinstance(field, CountedField)
+    for enemy, position in zip(chasers, start):
+        assert enemy._state is EnemyState_CHASE
+        assert enemy.position.get_distance(scene.player.position) < (
+            position.get_distance(scene.player.position)
+        )
@@ -0,0 +1,30 @@
+from core.math import grid_ray
+
+
+def test_grid_ray_straight():
+    assert list(grid_ray(0.5, 0.5, 3.5, 0.5)) == [(0, 0), (1, 0), (2, 0), (3, 0)]
+    assert list(grid_ray(3.5, 0.5, 0.5, 0.5)) == [(3, 0), (2, 0), (1, 0), (0, 0)]
+
+
+def test_grid_ray_corner():
+    # -- both side cells come before the diagonal one
+    assert list(grid_ray(0.5, 0.5, 1.5, 1.5)) == [(0, 0), (1, 0), (0, 1), (1, 1)]
+
+
+def test_grid_ray_ends_on_border():
+    # -- the end cell is past the border in both directions
+    assert list(grid_ray(0.5, 0.5, 2.0, 0.5)) == [(0, 0), (1, 0), (2, 0)]
+    assert list(grid_ray(2.5, 0.5, 1.0, 0.5)) == [(2, 0), (1, 0), (0, 0)]
+    assert list(grid_ray(0.5, 2.5, 0.5, 1.0)) == [(0, 2), (0, 1), (0, 0)]
+
+
+def test_grid_ray_ends_on_corner_moving_back():
+    assert list(grid_ray(2.5, 2.5, 1.0, 1.0)) == [
+        (2, 2), (1, 2), (2, 1), (1, 1), (0, 1), (1, 0), (0, 0)
+    ]
+
+
+def test_grid_ray_half_cell_corners():
+    # -- corners hit on half cells are exact ties, not rounding noise
+    cells = list(grid_ray(4.5, 12.5, -12.0, 13.0))
+    assert cells[-3:] == [(-13, 12), (-12, 13), (-13, 13)]